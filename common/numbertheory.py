@@ -0,0 +1,51 @@
+# Number theory helpers shared by lab3 (RSA) and lab4 (Schnorr, qDSA).
+# The labs add this directory to sys.path:
+#   sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+import functools
+
+def egcd(a, b):
+    """computes g, x, y such that g = GCD(a, b) and x*a + y*b = g
+    (iterative, so there is no recursion limit and no call per division step)"""
+    old_r, r = a, b
+    old_x, x = 1, 0
+    old_y, y = 0, 1
+    while r:
+        q = old_r // r
+        old_r, r = r, old_r - q * r
+        old_x, x = x, old_x - q * x
+        old_y, y = y, old_y - q * y
+    return (old_r, old_x, old_y)
+
+def modinv(a, m):
+    """computes a^(-1) mod m"""
+    try:
+        # Python >= 3.8 computes the inverse in C
+        return pow(a, -1, m)
+    except ValueError:
+        g, x, y = egcd(a % m, m)
+        if g != 1:
+            raise ValueError('modular inverse does not exist')
+        return x % m
+
+@functools.lru_cache(maxsize=4096)
+def cached_modinv(a, m):
+    """modinv memoized on (a, m), for values inverted repeatedly modulo a fixed modulus such as qDSA"""
+    return modinv(a, m)
+
+def batch_inverse(values, m):
+    """computes the inverses mod m of all the values with a single modular inversion
+    (Montgomery's trick: 3(n-1) multiplications instead of n inversions)"""
+    values = list(values)
+    if not values:
+        return []
+    # prefix[i] = values[0] * ... * values[i] mod m
+    prefix = [values[0] % m]
+    for v in values[1:]:
+        prefix.append(prefix[-1] * v % m)
+    inv = modinv(prefix[-1], m)
+    out = [0] * len(values)
+    for i in range(len(values) - 1, 0, -1):
+        out[i] = inv * prefix[i - 1] % m
+        inv = inv * values[i] % m
+    out[0] = inv
+    return out
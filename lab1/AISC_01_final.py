@@ -1,72 +1,258 @@
+import functools
+import mmap
+import os
 import numpy as np
 
+#frequency of English letters in alphabetical order
+english_letter_freqs = [0.085516907,
+    0.016047959,
+    0.031644354,
+    0.038711837,
+    0.120965225,
+    0.021815104,
+    0.020863354,
+    0.049557073,
+    0.073251186,
+    0.002197789,
+    0.008086975,
+    0.042064643,
+    0.025263217,
+    0.071721849,
+    0.074672654,
+    0.020661661,
+    0.001040245,
+    0.063327101,
+    0.067282031,
+    0.089381269,
+    0.026815809,
+    0.010593463,
+    0.018253619,
+    0.001913505,
+    0.017213606,
+    0.001137563]
+
+# byte -> letter index lookups, (b - ord('a')) % 26 and (b - ord('A')) % 26 for every byte value
+_FROM_LOWER = ((np.arange(256) - ord('a')) % 26).astype(np.uint8)
+_FROM_UPPER = ((np.arange(256) - ord('A')) % 26).astype(np.uint8)
+# reduced index -> letter lookups, valid for sums of two letter indices (< 52)
+_TO_UPPER = ((np.arange(52) % 26) + ord('A')).astype(np.uint8)
+_TO_LOWER = ((np.arange(52) % 26) + ord('a')).astype(np.uint8)
+
+def text_to_array(text):
+    """Map a str, bytes or bytearray to a uint8 array (no copy for bytes-like input)"""
+    if isinstance(text, str):
+        text = text.encode('ascii')
+    return np.frombuffer(text, dtype=np.uint8)
+
+@functools.lru_cache(maxsize=64)
+def _substitution_tables(key):
+    """Byte-level encryption and decryption tables for a substitution key given as a tuple"""
+    enc = np.zeros(256, dtype=np.uint8)
+    dec = np.zeros(256, dtype=np.uint8)
+    letters = np.arange(26)
+    enc[letters + ord('a')] = np.asarray(key) + ord('A')
+    dec[np.asarray(key) + ord('A')] = letters + ord('a')
+    # bytes outside the alphabet map to 0 and are rejected after the lookup
+    return enc, dec
+
+def substitution_tables(key):
+    """Returns the (encryption, decryption) lookup tables of key, computed once per key"""
+    return _substitution_tables(tuple(int(k) for k in key))
+
+def _apply_table(table, data):
+    out = table[text_to_array(data)]
+    if not out.all():
+        raise ValueError('text contains characters outside the cipher alphabet')
+    return out.tobytes()
+
+def substitute_encrypt_bytes(message, key):
+    """Encrypt message (str or bytes of lowercase letters) by substitution, returns uppercase bytes"""
+    return _apply_table(substitution_tables(key)[0], message)
+
+def substitute_decrypt_bytes(cryptogram, key):
+    """Decrypt cryptogram (str or bytes of uppercase letters) by substitution, returns lowercase bytes"""
+    return _apply_table(substitution_tables(key)[1], cryptogram)
+
+def _vigenere_shift(idx, keynum, phase):
+    """Add keynum to idx in place, key letter keynum[phase] being applied to idx[0]"""
+    keynum = np.roll(keynum, -phase)
+    klen = len(keynum)
+    full = len(idx) - len(idx) % klen
+    # add the key row-wise on a (rows x klen) view, then the partial last row
+    idx[:full].reshape(-1, klen)[:] += keynum
+    idx[full:] += keynum[:len(idx) - full]
+    return idx
+
+def Vigenere_encrypt_bytes(message, key, phase=0):
+    """Encrypt message (str or bytes) using Vigenere, returns uppercase bytes.
+    phase is the position in the key of the first character of message."""
+    idx = _FROM_LOWER[text_to_array(message)]
+    keynum = _FROM_LOWER[text_to_array(key)]
+    return _TO_UPPER[_vigenere_shift(idx, keynum, phase % len(keynum))].tobytes()
+
+def Vigenere_decrypt_bytes(cryptogram, key, phase=0):
+    """Decrypt cryptogram (str or bytes) using Vigenere, returns lowercase bytes.
+    phase is the position in the key of the first character of cryptogram."""
+    idx = _FROM_UPPER[text_to_array(cryptogram)]
+    # subtracting k is adding 26 - k, which keeps the sums in range(0,52)
+    keynum = 26 - _FROM_LOWER[text_to_array(key)]
+    return _TO_LOWER[_vigenere_shift(idx, keynum, phase % len(keynum))].tobytes()
+
 def substitute_encrypt(message, key):
     """Encrypt message using character substitution. Key is a random permutation of the 26 letters"""
-    # map message to numerical array in range(0,26)
-    plain = [x - ord('a') for x in map(ord,message)]
-    # apply substitution according to key
-    cipher = [key[x] for x in plain]
-    # rewrite numerical array in uppercase letters
-    cryptogram = [chr(x+ord('A')) for x in cipher]
-    return ''.join(cryptogram)
+    return substitute_encrypt_bytes(message, key).decode('ascii')
     
 def substitute_decrypt(cryptogram, key):
     """Decrypt cryptogram using character substitution. Key is a random permutation of the 26 letters"""
-    # map cryptogram to numerical array in range(0,26)
-    cipher = [x - ord('A') for x in map(ord,cryptogram)]
-    # compute inverse permutation
-    rev_key = np.argsort(key)
-    # apply inverse substitution according to key
-    plain = [rev_key[x] for x in cipher]
-    # rewrite numerical array in lowercase letters
-    message = [chr(x+ord('a')) for x in plain]
-    return ''.join(message)
+    return substitute_decrypt_bytes(cryptogram, key).decode('ascii')
 
 def Vigenere_encrypt(message, key):
     """Encrypt message using Vigenere algorithm. Key is a password."""
-    # map message to numerical array in range(0,26)
-    plain = [x - ord('a') for x in map(ord,message)]
-    # map key (password) to numerical array in range(0,26)
-    keynum = [x - ord('a') for x in map(ord,key)]
-    # allocate empty array
-    cipher = [0] * len(plain)
-    i = 0
-    klen = len(key)
-    for k in keynum:
-        # substistute one character every klen characters according to key[i]
-        cipher[i::klen] = [(x + k) % 26 for x in plain[i::klen] ]
-        i = i + 1
-    # rewrite numerical array in uppercase letters
-    cryptogram = [chr(x+ord('A')) for x in cipher]
-    return ''.join(cryptogram)
+    return Vigenere_encrypt_bytes(message, key).decode('ascii')
     
 def Vigenere_decrypt(cryptogram, key):
     """Encrypt message using Vigenere algorithm. Key is a password."""
-    # map cryptogram to numerical array in range(0,26)
-    cipher = [x - ord('A') for x in map(ord,cryptogram)]
-    # map key (password) to numerical array in range(0,26)
-    keynum = [x - ord('a') for x in map(ord,key)]
-    # allocate empty array
-    plain = [0] * len(cipher)
-    i = 0
-    klen = len(key)
-    for k in keynum:
-        # substistute one character every klen characters according to key[i]
-        plain[i::klen] = [(x - k) % 26 for x in cipher[i::klen] ]
-        i = i + 1
-    # rewrite numerical array in lowercase letters
-    message = [chr(x+ord('a')) for x in plain]
-    return ''.join(message)
+    return Vigenere_decrypt_bytes(cryptogram, key).decode('ascii')
+
+def iter_file_chunks(path, chunk_size=1 << 20):
+    """Yield the content of file path as successive bytes chunks of chunk_size, read through mmap"""
+    with open(path, 'rb') as f:
+        # mmap cannot map an empty file
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for start in range(0, len(mm), chunk_size):
+                yield mm[start:start + chunk_size]
+
+def substitute_encrypt_stream(chunks, key):
+    """Encrypt an iterable of message chunks by substitution, yields cryptogram chunks"""
+    for chunk in chunks:
+        yield substitute_encrypt_bytes(chunk, key)
+
+def substitute_decrypt_stream(chunks, key):
+    """Decrypt an iterable of cryptogram chunks by substitution, yields message chunks"""
+    for chunk in chunks:
+        yield substitute_decrypt_bytes(chunk, key)
+
+def Vigenere_encrypt_stream(chunks, key):
+    """Encrypt an iterable of message chunks using Vigenere, keeping the key phase across chunks"""
+    phase = 0
+    for chunk in chunks:
+        yield Vigenere_encrypt_bytes(chunk, key, phase)
+        phase = (phase + len(chunk)) % len(key)
+
+def Vigenere_decrypt_stream(chunks, key):
+    """Decrypt an iterable of cryptogram chunks using Vigenere, keeping the key phase across chunks"""
+    phase = 0
+    for chunk in chunks:
+        yield Vigenere_decrypt_bytes(chunk, key, phase)
+        phase = (phase + len(chunk)) % len(key)
+
+def cipher_file(in_path, out_path, stream, key, chunk_size=1 << 20):
+    """Apply stream (one of the *_stream functions) with key to file in_path, writing out_path
+    incrementally. Memory use is bounded by chunk_size whatever the file size.
+    Returns the number of bytes processed."""
+    n = 0
+    with open(out_path, 'wb') as out:
+        for chunk in stream(iter_file_chunks(in_path, chunk_size), key):
+            out.write(chunk)
+            n += len(chunk)
+    return n
+
+# uppercase letter -> index in range(0,26), 255 for any other byte
+_UPPER_INDEX = np.full(256, 255, dtype=np.uint8)
+_UPPER_INDEX[ord('A'):ord('Z') + 1] = np.arange(26)
+
+# largest alphabet size 26^k counted with a dense bincount, sparser spaces use np.unique
+DENSE_KGRAM_LIMIT = 1 << 24
+# the dense bincount is also only used when 26^k is at most this many times the number of k-grams
+DENSE_KGRAM_FACTOR = 8
+
+def kgram_codes(cryptogram, k):
+    """Returns the base-26 codes of all the k-grams of cryptogram (overlapping windows).
+    k-grams containing characters other than uppercase letters are discarded."""
+    if not 1 <= k <= 13:
+        # 26^13 is the largest power of 26 representable in an int64
+        raise ValueError('k must be in range(1,14)')
+    idx = _UPPER_INDEX[text_to_array(cryptogram)]
+    n = len(idx) - k + 1
+    if n <= 0:
+        return np.zeros(0, dtype=np.int64)
+    # rolling code: code = 26*code + next letter, for all windows at once
+    codes = idx[:n].astype(np.int64)
+    valid = idx[:n] != 255
+    for j in range(1, k):
+        nxt = idx[j:j + n]
+        codes *= 26
+        codes += nxt
+        valid &= nxt != 255
+    return codes[valid]
+
+def kgram_counts(cryptogram, k, dense=None):
+    """Returns (codes, counts) of the k-grams of cryptogram.
+    With dense, codes is range(26^k) and counts includes zero entries, otherwise only the
+    k-grams occurring in cryptogram are returned, in increasing code order. By default the
+    dense table is used when 26^k is at most DENSE_KGRAM_LIMIT and DENSE_KGRAM_FACTOR times
+    the number of k-grams."""
+    codes = kgram_codes(cryptogram, k)
+    size = 26 ** k
+    if dense is None:
+        dense = size <= min(DENSE_KGRAM_LIMIT, DENSE_KGRAM_FACTOR * len(codes))
+    if dense:
+        return np.arange(size), np.bincount(codes, minlength=size)
+    return np.unique(codes, return_counts=True)
+
+def number_to_kgram(x, k):
+    """Inverse of the base-26 k-gram code"""
+    letters = []
+    for _ in range(k):
+        x, r = divmod(int(x), 26)
+        letters.append(chr(r + ord('A')))
+    return ''.join(reversed(letters))
+
+def kgram_ranking(cryptogram, k, topn=None):
+    """Returns the topn most frequent k-grams in cryptogram as (k-gram, count) pairs,
+    by decreasing count and ties broken by alphabetical order"""
+    codes, counts = kgram_counts(cryptogram, k)
+    present = counts > 0
+    codes, counts = codes[present], counts[present]
+    if topn is not None and topn <= 0:
+        return []
+    if topn is not None and topn < len(counts):
+        # select the candidates in linear time: every k-gram at least as frequent as the
+        # topn-th one, so that the ties at the boundary are sorted too
+        kth = np.partition(counts, len(counts) - topn)[len(counts) - topn]
+        top = np.flatnonzero(counts >= kth)
+    else:
+        top = np.arange(len(counts))
+    top = top[np.lexsort((codes[top], -counts[top]))][:topn]
+    return [(number_to_kgram(codes[x], k), counts[x]) for x in top]
+
+def normalize_text(text):
+    """Returns the letters of text (str or bytes) as uppercase bytes, dropping every other character"""
+    if isinstance(text, str):
+        text = text.encode('ascii', 'ignore')
+    letters = np.frombuffer(text, dtype=np.uint8)
+    letters = np.where((letters >= ord('a')) & (letters <= ord('z')), letters - 32, letters)
+    return letters[_UPPER_INDEX[letters] != 255].astype(np.uint8).tobytes()
+
+def kgram_log_probs(text, k, floor=0.01):
+    """Returns the log10 probabilities of all the 26^k k-grams of text, indexed by base-26 code.
+    Unseen k-grams get the probability of floor occurrences."""
+    if 26 ** k > DENSE_KGRAM_LIMIT:
+        raise ValueError('k-gram space too large for a dense table')
+    return counts_to_log_probs(kgram_counts(normalize_text(text), k, dense=True)[1], floor)
+
+def counts_to_log_probs(counts, floor=0.01):
+    """log10 probabilities of k-gram counts, zero counts being replaced by floor"""
+    counts = counts.astype(np.float64)
+    total = max(counts.sum(), 1)
+    counts[counts == 0] = floor
+    return np.log10(counts / total)
 
 def monogram_ranking(cryptogram, topn=None):
     """Returns the topn most frequent monograms (letters) in cryptogram"""
-    # map letters to numerical values in range(0,26)
-    cipher = [x - ord('A') for x in map(ord,cryptogram)]
-    # compute histogram of letter values
-    freq = np.histogram(cipher, 26, (-0.5, 25.5))
-    # get sorted letters in decreasing order of their frequency
-    sorted_monograms = [(chr(x+ord('A')), freq[0][x]) for x in np.argsort(-freq[0])]
-    return sorted_monograms[0:topn]
+    return kgram_ranking(cryptogram, 1, topn)
 
 def digram_to_number(t, i):
     return 26*(ord(t[i]) - ord('A')) + ord(t[i+1]) - ord('A')
@@ -76,13 +262,7 @@ def number_to_digram(x):
 
 def digram_ranking(cryptogram, topn=None):
     """Returns the topn most frequent digrams (letter pairs) in cryptogram"""
-    # map digrams to numerical values in range(0,26*26)
-    digrams = [digram_to_number(cryptogram, i) for i in range(0,len(cryptogram)-1)]
-    # compute histogram of digram values
-    freq = np.histogram(digrams, 26*26, (-0.5, 26*26-0.5))
-    # get sorted digrams in decreasing order of their frequency
-    sorted_digrams = [(number_to_digram(x), freq[0][x]) for x in np.argsort(-freq[0])]
-    return sorted_digrams[0:topn]
+    return kgram_ranking(cryptogram, 2, topn)
     
 def trigram_to_number(t, i):
     return 26*26*(ord(t[i]) - ord('A')) + 26*(ord(t[i+1]) - ord('A')) + ord(t[i+2]) - ord('A')
@@ -92,28 +272,11 @@ def number_to_trigram(x):
 
 def trigram_ranking(cryptogram, topn=None):
     """Returns the topn most frequent trigrams (letter triplets) in cryptogram"""
-    # map trigrams to numerical values in range(0,26*26*26)
-    trigrams = [trigram_to_number(cryptogram, i) for i in range(0,len(cryptogram)-2)]
-    # compute histogram of trigram values
-    freq = np.histogram(trigrams, 26*26*26, (-0.5, 26*26*26-0.5))
-    # get sorted trigrams in decreasing order of their frequency
-    sorted_trigrams = [(number_to_trigram(x), freq[0][x]) for x in np.argsort(-freq[0])]
-    return sorted_trigrams[0:topn]
-
-def four_ranking(c, top):
-    #Aggiunto
-    f=dict()
-    for i in range(0,len(c)-4):
-        string=c[i]+c[i+1]+c[i+2]+c[i+3]
-        if string in f.keys():
-            f[string]=f[string]+1
-        else:
-            f[string]=1
-    f = sorted(f.items(), key=lambda x: -x[1])
-    l=list()
-    for i in range(0,top):
-        l.append(f[i][0])
-    return l
+    return kgram_ranking(cryptogram, 3, topn)
+
+def four_ranking(cryptogram, topn=None):
+    """Returns the topn most frequent 4-grams in cryptogram"""
+    return kgram_ranking(cryptogram, 4, topn)
 
 def crypto_freq(cryptogram):
     """Returns the relative frequencies of characters in cryptogram"""
@@ -125,37 +288,79 @@ def crypto_freq(cryptogram):
     return freq[0] / len(cipher)
     
 def periodic_corr(x, y):
-    """Periodic correlation, implemented using the FFT. x and y must be real sequences with the same length."""
-    return np.fft.ifft(np.fft.fft(x) * np.fft.fft(y).conj()).real 
+    """Periodic correlation, implemented using the FFT. x and y must be real sequences with the same length.
+    Stacked sequences are correlated row by row along the last axis."""
+    X = np.fft.rfft(x)
+    Y = X if y is x else np.fft.rfft(y)
+    return np.fft.irfft(X * Y.conj(), np.shape(x)[-1])
+
+# index of coincidence of uniformly random letters
+RANDOM_IOC = 1 / 26
+
+def key_length_scores(cryptogram, max_period, max_letters=1 << 15):
+    """Returns the index of coincidence of cryptogram for every period in range(1, max_period+1).
+    The IoC of period p is pooled over all the residue classes mod p: it is the fraction of
+    letter pairs at a distance multiple of p that coincide. The coincidences at every distance are
+    counted at once by the FFT autocorrelation of the one-hot letter matrix.
+    Only the first max_letters letters are used (None for all of them), the one-hot matrix takes
+    416 bytes per letter."""
+    idx = _UPPER_INDEX[text_to_array(cryptogram)]
+    idx = idx[idx != 255][:max_letters]
+    n = len(idx)
+    periods = np.arange(1, max_period + 1)
+    if n < 2:
+        return periods, np.zeros(max_period)
+    # zero padding to 2n turns the periodic correlation into a linear one
+    onehot = np.zeros((26, 2 * n))
+    onehot[idx, np.arange(n)] = 1
+    coincidences = np.rint(periodic_corr(onehot, onehot).sum(axis=0)[:n])
+    scores = np.zeros(max_period)
+    for p in periods[periods < n]:
+        m = (n - 1) // p
+        # pairs at distance k*p, k = 1..m, are n - k*p
+        scores[p - 1] = coincidences[p::p].sum() / (m * n - p * m * (m + 1) // 2)
+    return periods, scores
+
+def estimate_key_length(cryptogram, max_period, min_period=1, max_letters=1 << 15):
+    """Returns the (period, IoC) candidates in range(min_period, max_period+1), best first"""
+    periods, scores = key_length_scores(cryptogram, max_period, max_letters)
+    periods, scores = periods[min_period - 1:], scores[min_period - 1:]
+    order = np.argsort(-scores, kind='stable')
+    return [(int(periods[i]), scores[i]) for i in order]
+
+def best_key_length(cryptogram, max_period, min_period=1, tolerance=0.8, max_letters=1 << 15):
+    """Returns the most likely Vigenere key length in range(min_period, max_period+1).
+    Multiples of the key length score as high as the key length itself, so the smallest period
+    whose IoC excess over RANDOM_IOC is at least tolerance times the best one is returned.
+    Texts too short or too flat for any excess (best IoC not above RANDOM_IOC) get the best
+    period of the ranking."""
+    ranking = estimate_key_length(cryptogram, max_period, min_period, max_letters)
+    if not ranking:
+        raise ValueError('empty range of periods')
+    best = ranking[0][1] - RANDOM_IOC
+    if best <= 0:
+        return ranking[0][0]
+    return min(p for p, score in ranking if score - RANDOM_IOC >= tolerance * best)
+
+def recover_vigenere_key(cryptogram, period, profile=english_letter_freqs):
+    """Recover a Vigenere key of known length from cryptogram.
+    The cryptogram is laid out as a (rows x period) array: every column is a Caesar cipher whose
+    shift maximizes the periodic correlation of its letter frequencies with profile.
+    Returns the key and, for every column, the margin between the best and second best correlation."""
+    idx = _UPPER_INDEX[text_to_array(cryptogram)]
+    idx = idx[idx != 255]
+    # all the column histograms in one bincount
+    cols = np.arange(len(idx)) % period
+    hist = np.bincount(cols * 26 + idx, minlength=period * 26).reshape(period, 26)
+    freqs = hist / np.maximum(hist.sum(axis=1, keepdims=True), 1)
+    # all the 26 shifts of all the columns at once
+    R = periodic_corr(freqs, np.asarray(profile))
+    shifts = np.argmax(R, axis=1)
+    R.sort(axis=1)
+    key = (shifts + ord('a')).astype(np.uint8).tobytes().decode('ascii')
+    return key, R[:, -1] - R[:, -2]
 
 def main():
-    #frequency of English letters in alphabetical order
-    english_letter_freqs = [0.085516907,
-    0.016047959,
-    0.031644354,
-    0.038711837,
-    0.120965225,
-    0.021815104,
-    0.020863354,
-    0.049557073,
-    0.073251186,
-    0.002197789,
-    0.008086975,
-    0.042064643,
-    0.025263217,
-    0.071721849,
-    0.074672654,
-    0.020661661,
-    0.001040245,
-    0.063327101,
-    0.067282031,
-    0.089381269,
-    0.026815809,
-    0.010593463,
-    0.018253619,
-    0.001913505,
-    0.017213606,
-    0.001137563]
     
     ###################################################################################
     #EXERCISE 1
@@ -198,54 +403,9 @@ def main():
     with open("cryptogram02.txt","r") as text_file:
         cryptogram2 = text_file.read()
         
-    ln_k=0 
-    for i in range(5, 22):
-        subsequence=cryptogram2[0::i]
-        fr=crypto_freq(subsequence) 
-        s=0
-        for j in range(0,25):
-            s+=np.power(fr[j],2)
-        if(s>=0.065):
-            ln_k=i
+    ln_k=best_key_length(cryptogram2, 21, min_period=5)
     print(ln_k)
-    kloff=list()
-    offsets=list()
-    i=0
-    #trovo gli offsets da 19 lettere l'uno
-    while i<len(cryptogram2):
-        offsets.append(cryptogram2[i:i+ln_k])
-        i+=ln_k
-    
-    #dagli offset prendo la k lettera e creo le subsequences
-    for i in range(0,ln_k):
-        #ogni lettera i
-        subs=list()
-        for j in offsets:
-            #di ogni offset j
-            if(len(j)>i):
-                subs.append(j[i])
-        #subs è ora una lista delle lettere con la stessa cifratura
-        #trovo la loro freq e la impongo = a fre_engl
-        fr=crypto_freq(subs)
-        #faccio la circular correlation per trovare il k di distanza della ceasar
-        R=periodic_corr(fr, english_letter_freqs)
-        maxr=-100
-        #k sarà la correlazione con valore maggiore, quindi quello giusto
-        k=-1
-        for j in range(0,len(R)):
-            if R[j]>maxr:
-                maxr=R[j]
-                k=j
-               
-        kloff.append(k+1)
-        
-    dictt = {'1':'a','2':'b','3':'c','4':'d','5':'e','6':'f','7':'g','8':'h',
-    '9':'i','10':'j','11':'k','12':'l','13':'m','14':'n','15':'o','16':'p','17':'q',
-    '18':'r','19':'s','20':'t','21':'u','22':'v','23':'w','24':'x','25':'y','26':'z'
-    } 
-    key=''
-    for i in kloff:
-        key+=dictt[str(i)]
+    key, margins = recover_vigenere_key(cryptogram2, ln_k)
     
     solution_cr02=Vigenere_decrypt(cryptogram2, key)
     print('Ex2\nThe key is: '+key)
@@ -260,54 +420,9 @@ def main():
     with open("cryptogram03.txt","r") as text_file:
         cryptogram3 = text_file.read()
     #ther is a key length?
-    ln_k=0 
-    for i in range(1, 9):
-        subsequence=cryptogram3[0::i]
-        fr=crypto_freq(subsequence) 
-        s=0
-        for j in range(0,25):
-            s+=np.power(fr[j],2)
-        if(s>=0.064):
-            ln_k=i
+    ln_k=best_key_length(cryptogram3, 8)
     print(ln_k)
-    kloff=list()
-    offsets=list()
-    i=0
-    #trovo gli offsets da 8 lettere l'uno
-    while i<len(cryptogram3):
-        offsets.append(cryptogram3[i:i+ln_k])
-        i+=ln_k
-    
-    #dagli offset prendo la k lettera e creo le subsequences
-    for i in range(0,ln_k):
-        #ogni lettera i
-        subs=list()
-        for j in offsets:
-            #di ogni offset j
-            if(len(j)>i):
-                subs.append(j[i])
-        #subs è ora una lista delle lettere con la stessa cifratura
-        #trovo la loro freq e la impongo = a fre_engl
-        fr=crypto_freq(subs)
-        #faccio la circular correlation per trovare il k di distanza della ceasar
-        R=periodic_corr(fr, english_letter_freqs)
-        maxr=-100
-        #k sarà la correlazione con valore maggiore, quindi quello giusto
-        k=-1
-        for j in range(0,len(R)):
-            if R[j]>maxr:
-                maxr=R[j]
-                k=j
-                
-        kloff.append(k+1)
-        
-    dictt = {'1':'a','2':'b','3':'c','4':'d','5':'e','6':'f','7':'g','8':'h',
-    '9':'i','10':'j','11':'k','12':'l','13':'m','14':'n','15':'o','16':'p','17':'q',
-    '18':'r','19':'s','20':'t','21':'u','22':'v','23':'w','24':'x','25':'y','26':'z'
-    } 
-    key=''
-    for i in kloff:
-        key+=dictt[str(i)]
+    key, margins = recover_vigenere_key(cryptogram3, ln_k)
     
     solution_cr03=Vigenere_decrypt(cryptogram3, key)
     print('Ex3\nThe key is: '+key)
@@ -0,0 +1,128 @@
+# Batch cryptanalysis of a corpus of cryptograms.
+# Every file is classified as monoalphabetic or polyalphabetic from its index of
+# coincidence, solved by the matching solver in a worker pool, and reported as one
+# JSON line (key, plaintext path, score, timing) as soon as it is done.
+#
+# usage: python batch_solve.py --model MODEL_DIR 'cryptograms/*.txt' --out-dir plain/
+#        python batch_solve.py --corpus CORPUS.txt 'cryptograms/*.txt' --out-dir plain/
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+
+from AISC_01_final import (normalize_text, kgram_log_probs, key_length_scores, best_key_length,
+                           substitute_decrypt, Vigenere_decrypt)
+from substitution_solver import solve_substitution
+from vigenere_solver import solve_vigenere
+from language_model import LanguageModel
+
+# IoC above which a cryptogram is taken as monoalphabetic (English ~0.066, random ~0.038)
+MONO_IOC = 0.055
+
+# per-worker quadgram table, set by _init_worker
+_quadgrams = None
+
+def _init_worker(quadgrams):
+    """quadgrams is a table or the directory of a LanguageModel, memory-mapped by every worker"""
+    global _quadgrams
+    _quadgrams = LanguageModel(quadgrams).quadgrams if isinstance(quadgrams, str) else quadgrams
+
+def classify(cryptogram, max_period=40):
+    """Returns ('substitution', 1) or ('vigenere', period) from the statistics of cryptogram"""
+    periods, scores = key_length_scores(cryptogram, 1)
+    if scores[0] >= MONO_IOC:
+        return 'substitution', 1
+    return 'vigenere', best_key_length(cryptogram, max_period)
+
+def solve_file(path, out_dir, max_period=40, quadgrams=None):
+    """Classify and solve the cryptogram in path, writing the plaintext in out_dir.
+    Returns the result record of the file."""
+    quadgrams = _quadgrams if quadgrams is None else quadgrams
+    start_time = time.perf_counter()
+    with open(path, 'rb') as f:
+        cryptogram = normalize_text(f.read()).decode('ascii')
+    record = {'file': path}
+    if len(cryptogram) < 4:
+        record.update(error='cryptogram too short', seconds=time.perf_counter() - start_time)
+        return record
+    cipher, period = classify(cryptogram, max_period)
+    if cipher == 'substitution':
+        key, score, stats = solve_substitution(cryptogram, quadgrams)
+        plaintext = substitute_decrypt(cryptogram, key)
+        key = (np.asarray(key) + ord('A')).astype(np.uint8).tobytes().decode('ascii')
+    else:
+        key, score, stats = solve_vigenere(cryptogram, quadgrams, period)
+        plaintext = Vigenere_decrypt(cryptogram, key)
+    plain_path = os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0] + '.plain.txt')
+    with open(plain_path, 'w') as f:
+        f.write(plaintext)
+    record.update(cipher=cipher, period=period, key=key, plaintext=plain_path,
+                  # log10 probability per quadgram, comparable across lengths
+                  score=float(score) / (len(cryptogram) - 3),
+                  iterations=stats['iterations'], seconds=time.perf_counter() - start_time)
+    return record
+
+def iter_paths(patterns):
+    """Expand directories and glob patterns into file paths"""
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*')
+        for path in sorted(glob.glob(pattern)):
+            if os.path.isfile(path):
+                yield path
+
+def solve_corpus(paths, quadgrams, out_dir, workers=None, max_period=40, out=sys.stdout):
+    """Solve every file in paths over a process pool, writing one JSON line per file to out
+    in completion order. quadgrams is a table or the directory of a LanguageModel; at most 4
+    tasks per worker are in flight, so paths may be a lazy iterable of any length. A file whose
+    solver raises gets an error record and does not stop the run.
+    Returns the number of files solved."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = iter(paths)
+    count = 0
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(quadgrams,)) as pool:
+        limit = 4 * workers
+        pending = {}
+        while True:
+            for path in paths:
+                pending[pool.submit(solve_file, path, out_dir, max_period)] = path
+                if len(pending) >= limit:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    record = future.result()
+                except Exception as e:
+                    record = {'file': path, 'error': '%s: %s' % (type(e).__name__, e)}
+                out.write(json.dumps(record) + '\n')
+                count += 1
+            out.flush()
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description='Solve a directory of substitution and Vigenere cryptograms')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--model', help='directory of a language model built by language_model.py')
+    source.add_argument('--corpus', help='English text used to build the quadgram table')
+    parser.add_argument('inputs', nargs='+', help='cryptogram files, directories or glob patterns')
+    parser.add_argument('--out-dir', default='plaintexts', help='directory of the decrypted texts')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-period', type=int, default=40)
+    args = parser.parse_args()
+    if args.model:
+        quadgrams = args.model
+    else:
+        with open(args.corpus, 'r', errors='ignore') as f:
+            quadgrams = kgram_log_probs(f.read(), 4)
+    solve_corpus(iter_paths(args.inputs), quadgrams, args.out_dir, args.workers, args.max_period)
+
+if __name__ == '__main__':
+    main()
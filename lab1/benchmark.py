@@ -0,0 +1,110 @@
+# Benchmarks of the classical ciphers and frequency analysis primitives of AISC_01_final.
+# Texts are synthetic (letters drawn with English frequencies, then enciphered), so the
+# suite runs offline. For every primitive and text size it measures the throughput (MB/s)
+# and the peak memory allocated, fits the scaling exponent of time versus size and writes
+# everything as JSON, which can be compared against an earlier run.
+#
+# usage: python benchmark.py --out results.json [--sizes 1e3 1e6] [--compare baseline.json]
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import numpy as np
+
+import AISC_01_final as lab1
+
+DEFAULT_SIZES = [10**3, 10**4, 10**5, 10**6, 10**7, 10**8]
+KEY = 'benchmarkkey'
+
+def synthetic_texts(size, seed=0):
+    """Returns (message, substitution key, substitution cryptogram, Vigenere cryptogram) of size letters"""
+    rng = np.random.default_rng(seed)
+    p = np.asarray(lab1.english_letter_freqs)
+    letters = rng.choice(26, size, p=p / p.sum()).astype(np.uint8)
+    message = (letters + ord('a')).tobytes().decode('ascii')
+    key = rng.permutation(26)
+    return message, key, lab1.substitute_encrypt(message, key), lab1.Vigenere_encrypt(message, KEY)
+
+def cases(size):
+    """Returns the (name, callable) pairs benchmarked on texts of size letters"""
+    message, key, subst, vig = synthetic_texts(size)
+    signal = np.random.default_rng(1).random(max(size // 8, 1))
+    return [
+        ('substitute_encrypt', lambda: lab1.substitute_encrypt(message, key)),
+        ('substitute_decrypt', lambda: lab1.substitute_decrypt(subst, key)),
+        ('Vigenere_encrypt', lambda: lab1.Vigenere_encrypt(message, KEY)),
+        ('Vigenere_decrypt', lambda: lab1.Vigenere_decrypt(vig, KEY)),
+        ('monogram_ranking', lambda: lab1.monogram_ranking(subst, 10)),
+        ('digram_ranking', lambda: lab1.digram_ranking(subst, 10)),
+        ('trigram_ranking', lambda: lab1.trigram_ranking(subst, 10)),
+        ('four_ranking', lambda: lab1.four_ranking(subst, 10)),
+        ('crypto_freq', lambda: lab1.crypto_freq(subst)),
+        # same number of input bytes, as float64 samples
+        ('periodic_corr', lambda: lab1.periodic_corr(signal, signal[::-1].copy())),
+    ]
+
+def measure(func, min_time=0.2, max_repeat=1000):
+    """Returns the best time of func over repeated runs and the peak memory of one run"""
+    times = []
+    total = 0.0
+    while total < min_time and len(times) < max_repeat:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+        total += elapsed
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak
+
+def run(sizes, names=None, out=sys.stderr):
+    results = []
+    for size in sizes:
+        for name, func in cases(size):
+            if names and name not in names:
+                continue
+            seconds, peak = measure(func)
+            results.append({'name': name, 'size': size, 'seconds': seconds,
+                            'mb_per_s': size / seconds / 1e6, 'peak_bytes': peak})
+            print('%-20s %10d B %10.2f MB/s %12d B peak' % (name, size, size / seconds / 1e6, peak), file=out)
+    return results
+
+def scaling(results):
+    """Slope of log(time) versus log(size) for every primitive, 1 means linear scaling"""
+    slopes = {}
+    for name in sorted({r['name'] for r in results}):
+        points = [(r['size'], r['seconds']) for r in results if r['name'] == name]
+        if len(points) > 1:
+            x, y = np.log(np.array(points)).T
+            slopes[name] = float(np.polyfit(x, y, 1)[0])
+    return slopes
+
+def compare(results, baseline, out=sys.stderr):
+    """Print the speedup of results over baseline for the (name, size) pairs present in both"""
+    base = {(r['name'], r['size']): r['seconds'] for r in baseline['results']}
+    for r in results:
+        if (r['name'], r['size']) in base:
+            print('%-20s %10d B %8.2fx' % (r['name'], r['size'], base[r['name'], r['size']] / r['seconds']), file=out)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the lab1 primitives')
+    parser.add_argument('--sizes', type=float, nargs='+', default=DEFAULT_SIZES, help='text sizes in bytes')
+    parser.add_argument('--only', nargs='+', help='names of the primitives to run')
+    parser.add_argument('--out', default='benchmark.json', help='JSON file of the results')
+    parser.add_argument('--compare', help='JSON file of an earlier run')
+    args = parser.parse_args()
+    results = run([int(s) for s in args.sizes], args.only)
+    report = {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+              'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results, 'scaling': scaling(results)}
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+if __name__ == '__main__':
+    main()
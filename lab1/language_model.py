@@ -0,0 +1,74 @@
+# On-disk language model for cryptanalysis scoring.
+# The log10 probabilities of the mono-, di-, tri- and quadgrams of a text corpus are saved
+# as .npy arrays indexed by base-26 code (AAAA=0, AAAB=1, ...) and loaded lazily with
+# np.load(mmap_mode='r'), so every process scoring with the same model shares one copy
+# through the page cache.
+#
+# usage: python language_model.py MODEL_DIR corpus1.txt [corpus2.txt ...]
+import os
+import sys
+import numpy as np
+
+from AISC_01_final import iter_file_chunks, normalize_text, kgram_codes, counts_to_log_probs
+
+MAX_K = 4
+
+def table_path(directory, k):
+    return os.path.join(directory, 'logp%d.npy' % k)
+
+def corpus_counts(paths, max_k=MAX_K, chunk_size=1 << 24):
+    """Returns the k-gram counts of the files in paths for k in range(1, max_k+1).
+    Files are read in chunks; the last max_k-1 letters of a chunk are carried over so that no
+    k-gram across a chunk boundary is lost. Files are not joined to each other."""
+    counts = [np.zeros(26 ** k, dtype=np.int64) for k in range(1, max_k + 1)]
+    for path in paths:
+        carry = b''
+        for chunk in iter_file_chunks(path, chunk_size):
+            letters = carry + normalize_text(chunk)
+            for k in range(1, max_k + 1):
+                # k-grams starting in the carry were counted with the previous chunk
+                start = max(len(carry) - k + 1, 0)
+                counts[k - 1] += np.bincount(kgram_codes(letters[start:], k), minlength=26 ** k)
+            carry = letters[-(max_k - 1):] if max_k > 1 else b''
+    return counts
+
+def build_language_model(paths, directory, max_k=MAX_K, floor=0.01):
+    """Build the 1..max_k-gram log-probability tables of the corpus files in paths into directory"""
+    os.makedirs(directory, exist_ok=True)
+    for k, counts in enumerate(corpus_counts(paths, max_k), start=1):
+        np.save(table_path(directory, k), counts_to_log_probs(counts, floor))
+
+class LanguageModel:
+    """k-gram log-probability tables stored in directory, memory-mapped on first use"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._tables = {}
+
+    def table(self, k):
+        """Read-only log10 probability table of the k-grams, indexed by base-26 code"""
+        if k not in self._tables:
+            self._tables[k] = np.load(table_path(self.directory, k), mmap_mode='r')
+        return self._tables[k]
+
+    @property
+    def monograms(self):
+        return self.table(1)
+
+    @property
+    def quadgrams(self):
+        return self.table(4)
+
+    def letter_frequencies(self):
+        """Relative frequencies of the letters in alphabetical order"""
+        return 10 ** np.asarray(self.table(1))
+
+    def score(self, text, k=4):
+        """Sum of the k-gram log10 probabilities of text"""
+        return float(self.table(k)[kgram_codes(normalize_text(text), k)].sum())
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print('usage: python language_model.py MODEL_DIR corpus1.txt [corpus2.txt ...]')
+        sys.exit(1)
+    build_language_model(sys.argv[2:], sys.argv[1])
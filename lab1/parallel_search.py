@@ -0,0 +1,109 @@
+# Parallel random-restart driver for the stochastic key searches of
+# substitution_solver and vigenere_solver.
+# The letter encoding of the cryptogram and the quadgram table are placed once in
+# shared memory: every worker process attaches to them in its initializer and builds
+# its scorer once, so tasks only carry a restart seed.
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+
+from AISC_01_final import normalize_text
+from substitution_solver import QuadgramScorer, solve_substitution
+from vigenere_solver import VigenereScorer, solve_vigenere
+
+# per-worker state, set by _init_worker
+_worker = {}
+
+def _share(array):
+    """Copy array into a new shared memory block, returns the block and its descriptor"""
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+def _attach(descriptor):
+    name, shape, dtype = descriptor
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype, buffer=shm.buf)
+
+def _init_worker(kind, cipher_desc, quad_desc, period, stop):
+    cipher_shm, cipher = _attach(cipher_desc)
+    quad_shm, quadgrams = _attach(quad_desc)
+    if kind == 'substitution':
+        scorer = QuadgramScorer(cipher, quadgrams)
+    else:
+        scorer = VigenereScorer(cipher, quadgrams, period)
+    # the shared memory blocks must stay open as long as the arrays are in use
+    _worker.update(kind=kind, cipher=cipher, quadgrams=quadgrams, period=period, stop=stop,
+                   scorer=scorer, shm=(cipher_shm, quad_shm))
+
+def _restart(index, seed, solver_kwargs):
+    """Run one restart in a worker, restart 0 starts from the statistical guess"""
+    w = _worker
+    if w['stop'].is_set():
+        return None
+    rng = np.random.default_rng(seed)
+    if w['kind'] == 'substitution':
+        start = None if index == 0 else rng.permutation(26)
+        key, score, stats = solve_substitution(w['cipher'], w['quadgrams'], start=start, rng=rng,
+                                               scorer=w['scorer'], stop=w['stop'], **solver_kwargs)
+        key = key.tolist()
+    else:
+        start = None if index == 0 else (rng.integers(0, 26, w['period']) + ord('a')).astype(np.uint8).tobytes().decode('ascii')
+        key, score, stats = solve_vigenere(w['cipher'], w['quadgrams'], w['period'], start=start, rng=rng,
+                                           scorer=w['scorer'], stop=w['stop'], **solver_kwargs)
+    return key, float(score), os.getpid(), stats
+
+def parallel_restarts(cryptogram, quadgrams, kind='substitution', period=None, restarts=32,
+                      workers=None, target=None, seed=None, **solver_kwargs):
+    """Run restarts independent key searches on cryptogram over a process pool.
+    kind is 'substitution' or 'vigenere' (period is then required). Once a restart reaches a
+    score >= target the remaining restarts are cancelled and the running ones stopped.
+    solver_kwargs are passed to solve_substitution/solve_vigenere.
+    Returns (key, score, report) where report holds the restarts run, the elapsed time and,
+    for every worker pid, its restarts, iterations, busy time and best score."""
+    if kind not in ('substitution', 'vigenere'):
+        raise ValueError('kind must be substitution or vigenere')
+    if kind == 'vigenere' and period is None:
+        raise ValueError('the period is required for vigenere')
+    cipher = np.frombuffer(normalize_text(cryptogram), dtype=np.uint8)
+    cipher_shm, cipher_desc = _share(cipher)
+    quad_shm, quad_desc = _share(np.ascontiguousarray(quadgrams))
+    seeds = np.random.SeedSequence(seed).spawn(restarts)
+    ctx = multiprocessing.get_context()
+    stop = ctx.Event()
+    best_key, best_score = None, -np.inf
+    per_worker = {}
+    done = 0
+    start_time = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker,
+                                 initargs=(kind, cipher_desc, quad_desc, period, stop)) as pool:
+            futures = [pool.submit(_restart, i, s, solver_kwargs) for i, s in enumerate(seeds)]
+            for future in as_completed(futures):
+                result = future.result() if not future.cancelled() else None
+                if result is None:
+                    continue
+                key, score, pid, stats = result
+                done += 1
+                w = per_worker.setdefault(pid, {'restarts': 0, 'iterations': 0, 'seconds': 0.0, 'best_score': -np.inf})
+                w['restarts'] += 1
+                w['iterations'] += stats['iterations']
+                w['seconds'] += stats['seconds']
+                w['best_score'] = max(w['best_score'], score)
+                if score > best_score:
+                    best_key, best_score = key, score
+                if target is not None and best_score >= target and not stop.is_set():
+                    stop.set()
+                    for f in futures:
+                        f.cancel()
+    finally:
+        for shm in (cipher_shm, quad_shm):
+            shm.close()
+            shm.unlink()
+    if kind == 'substitution':
+        best_key = np.array(best_key)
+    report = {'restarts': done, 'seconds': time.perf_counter() - start_time, 'workers': per_worker}
+    return best_key, best_score, report
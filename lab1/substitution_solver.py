@@ -0,0 +1,108 @@
+# Automatic solver for substitution ciphers.
+# The decryption key is searched by hill climbing (or simulated annealing) over
+# permutations of the alphabet, scoring candidate plaintexts with a table of
+# quadgram log-probabilities (see kgram_log_probs).
+# Swapping two key letters only changes the quadgrams that contain one of the two
+# cipher letters involved, so each move is scored on those windows alone.
+import math
+import time
+import numpy as np
+
+from AISC_01_final import _UPPER_INDEX, text_to_array, normalize_text, english_letter_freqs, substitute_decrypt
+
+# weights of the 4 letters of a quadgram in its base-26 code
+_QUAD_WEIGHTS = np.array([26**3, 26**2, 26, 1])
+# number of random swaps drawn at once
+_BATCH = 4096
+
+class QuadgramScorer:
+    """Quadgram log-probability score of the decryptions of a fixed cryptogram"""
+
+    def __init__(self, cryptogram, quadgrams):
+        cipher = _UPPER_INDEX[text_to_array(normalize_text(cryptogram))]
+        if len(cipher) < 4:
+            raise ValueError('cryptogram too short to be scored with quadgrams')
+        self.cipher = cipher
+        self.quadgrams = quadgrams
+        n = len(cipher) - 3
+        # cipher letters of every quadgram window
+        self.windows = np.stack([cipher[j:j + n] for j in range(4)], axis=1)
+        # bitmask of the cipher letters present in every window
+        self.masks = np.zeros(n, dtype=np.int32)
+        for j in range(4):
+            self.masks |= np.left_shift(1, self.windows[:, j].astype(np.int32))
+        # windows containing each cipher letter
+        self.letter_windows = [np.flatnonzero(self.masks & (1 << x)) for x in range(26)]
+
+    def score(self, dec):
+        """Score of the plaintext obtained with dec (dec[cipher letter] = plain letter)"""
+        return self.quadgrams[dec[self.windows] @ _QUAD_WEIGHTS].sum()
+
+    def affected(self, x, y):
+        """Windows containing cipher letter x or y, each counted once"""
+        wy = self.letter_windows[y]
+        return np.concatenate((self.letter_windows[x], wy[(self.masks[wy] & (1 << x)) == 0]))
+
+    def swap_delta(self, dec, x, y):
+        """Change of score when the plain letters of cipher letters x and y are swapped"""
+        windows = self.windows[self.affected(x, y)]
+        swapped = dec.copy()
+        swapped[x], swapped[y] = dec[y], dec[x]
+        q = self.quadgrams
+        return q[swapped[windows] @ _QUAD_WEIGHTS].sum() - q[dec[windows] @ _QUAD_WEIGHTS].sum()
+
+def frequency_key(cryptogram):
+    """Decryption mapping pairing cipher letters and English letters by decreasing frequency"""
+    cipher = _UPPER_INDEX[text_to_array(normalize_text(cryptogram))]
+    cipher_order = np.argsort(-np.bincount(cipher, minlength=26), kind='stable')
+    english_order = np.argsort(-np.asarray(english_letter_freqs), kind='stable')
+    dec = np.zeros(26, dtype=np.intp)
+    dec[cipher_order] = english_order
+    return dec
+
+def solve_substitution(cryptogram, quadgrams, start=None, max_stall=2000, max_iterations=None,
+                       temperature=0.0, cooling=0.9995, rng=None, scorer=None, stop=None):
+    """Search the substitution key of cryptogram maximizing the quadgram score.
+    start is the initial decryption mapping (frequency_key by default). With temperature 0 the
+    search is a hill climbing, otherwise a worse swap is accepted with probability
+    exp(delta / temperature), the temperature being multiplied by cooling at every iteration.
+    The search stops after max_stall iterations without improving the best score, or when
+    stop.is_set() (checked every few thousand iterations).
+    Returns (key, score, stats) where key can be passed to substitute_decrypt and stats reports
+    the iterations, the elapsed time and the iterations per second."""
+    rng = np.random.default_rng(rng)
+    if scorer is None:
+        scorer = QuadgramScorer(cryptogram, quadgrams)
+    dec = frequency_key(cryptogram) if start is None else np.array(start, dtype=np.intp)
+    score = scorer.score(dec)
+    best_dec, best_score = dec.copy(), score
+    stall = iterations = 0
+    start_time = time.perf_counter()
+    while stall < max_stall and (max_iterations is None or iterations < max_iterations):
+        if iterations % _BATCH == 0:
+            if stop is not None and stop.is_set():
+                break
+            # draw the random swaps in batches, y != x
+            xs = rng.integers(0, 26, _BATCH)
+            ys = (xs + rng.integers(1, 26, _BATCH)) % 26
+        x, y = xs[iterations % _BATCH], ys[iterations % _BATCH]
+        iterations += 1
+        stall += 1
+        delta = scorer.swap_delta(dec, x, y)
+        if delta > 0 or (temperature > 0 and rng.random() < math.exp(delta / temperature)):
+            dec[x], dec[y] = dec[y], dec[x]
+            score += delta
+            if score > best_score + 1e-9:
+                best_dec, best_score = dec.copy(), score
+                stall = 0
+        temperature *= cooling
+    elapsed = time.perf_counter() - start_time
+    stats = {'iterations': iterations, 'seconds': elapsed,
+             'iterations_per_second': iterations / elapsed if elapsed > 0 else float('inf')}
+    # substitute_decrypt expects the encryption key: key[plain letter] = cipher letter
+    return np.argsort(best_dec), best_score, stats
+
+def decrypt_substitution(cryptogram, quadgrams, **kwargs):
+    """Solve cryptogram and return (plaintext, key, stats)"""
+    key, score, stats = solve_substitution(cryptogram, quadgrams, **kwargs)
+    return substitute_decrypt(cryptogram, key), key, stats
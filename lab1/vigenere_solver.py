@@ -0,0 +1,85 @@
+# Stochastic key search for Vigenere ciphers of known period.
+# Candidate keys are scored with quadgram log-probabilities (see kgram_log_probs).
+# A move re-optimizes one key letter: the 26 candidate letters are scored in turn on
+# the quadgram windows covering that key position only.
+import time
+import numpy as np
+
+from AISC_01_final import _UPPER_INDEX, text_to_array, normalize_text, recover_vigenere_key, Vigenere_decrypt
+from substitution_solver import _QUAD_WEIGHTS
+
+class VigenereScorer:
+    """Quadgram log-probability score of the Vigenere decryptions of a fixed cryptogram"""
+
+    def __init__(self, cryptogram, quadgrams, period):
+        cipher = _UPPER_INDEX[text_to_array(normalize_text(cryptogram))].astype(np.intp)
+        if len(cipher) < 4:
+            raise ValueError('cryptogram too short to be scored with quadgrams')
+        self.quadgrams = quadgrams
+        self.period = period
+        n = len(cipher) - 3
+        # cipher letters and key positions of every quadgram window
+        self.windows = np.stack([cipher[j:j + n] for j in range(4)], axis=1)
+        self.residues = (np.arange(n)[:, None] + np.arange(4)) % period
+        # windows covering each key position
+        self.position_windows = [np.flatnonzero((self.residues == j).any(axis=1)) for j in range(period)]
+
+    def score(self, key):
+        """Score of the plaintext obtained with key (array of shifts)"""
+        return self.quadgrams[((self.windows - key[self.residues]) % 26) @ _QUAD_WEIGHTS].sum()
+
+    def position_scores(self, key, j):
+        """Scores of the windows covering key position j, for the 26 values of key[j]"""
+        w = self.position_windows[j]
+        rw = self.residues[w]
+        key = key.copy()
+        key[j] = 0
+        # plaintext letters with key[j] = 0; candidate c shifts the letters of position j by -c
+        plain = (self.windows[w] - key[rw]) % 26
+        shift = rw == j
+        scores = np.empty(26)
+        for c in range(26):
+            scores[c] = self.quadgrams[((plain - c * shift) % 26) @ _QUAD_WEIGHTS].sum()
+        return scores
+
+def solve_vigenere(cryptogram, quadgrams, period, start=None, max_iterations=None,
+                   rng=None, scorer=None, stop=None):
+    """Search the Vigenere key of given period maximizing the quadgram score of cryptogram.
+    start is the initial key (the recover_vigenere_key guess by default). Every pass sets each
+    key position, in a shuffled order, to its best letter (one iteration per position); the
+    search stops after a full pass without improvement, after max_iterations iterations or
+    when stop.is_set().
+    Returns (key, score, stats) where key is a lowercase password."""
+    rng = np.random.default_rng(rng)
+    if scorer is None:
+        scorer = VigenereScorer(cryptogram, quadgrams, period)
+    if start is None:
+        start = recover_vigenere_key(cryptogram, period)[0]
+    key = _UPPER_INDEX[text_to_array(start.upper())].astype(np.intp)
+    score = scorer.score(key)
+    iterations = 0
+    improved = True
+    start_time = time.perf_counter()
+    while improved:
+        improved = False
+        for j in rng.permutation(period):
+            if (stop is not None and stop.is_set()) or (max_iterations is not None and iterations >= max_iterations):
+                improved = False
+                break
+            iterations += 1
+            scores = scorer.position_scores(key, j)
+            best = np.argmax(scores)
+            delta = scores[best] - scores[key[j]]
+            if delta > 1e-9:
+                key[j] = best
+                score += delta
+                improved = True
+    elapsed = time.perf_counter() - start_time
+    stats = {'iterations': iterations, 'seconds': elapsed,
+             'iterations_per_second': iterations / elapsed if elapsed > 0 else float('inf')}
+    return (key + ord('a')).astype(np.uint8).tobytes().decode('ascii'), score, stats
+
+def decrypt_vigenere(cryptogram, quadgrams, period, **kwargs):
+    """Solve cryptogram and return (plaintext, key, stats)"""
+    key, score, stats = solve_vigenere(cryptogram, quadgrams, period, **kwargs)
+    return Vigenere_decrypt(cryptogram, key), key, stats
@@ -15,9 +15,15 @@
 #          (CC BY-NC-SA 3.0)
 #===========================================================
 import sys
+import time
+import functools
+import threading
+import collections
 import random
 import base64
 import numpy as np
+
+from gf2m import GF16
  
 # S-Box
 sBox  = [0x9, 0x4, 0xa, 0xb, 0xd, 0x1, 0x8, 0x5,
@@ -27,23 +33,16 @@ sBox  = [0x9, 0x4, 0xa, 0xb, 0xd, 0x1, 0x8, 0x5,
 sBoxI = [0xa, 0x5, 0x9, 0xb, 0x1, 0x7, 0x8, 0xf,
          0x6, 0x0, 0x2, 0x3, 0xc, 0x4, 0xd, 0xe]
  
-# Round keys: K0 = w0 + w1; K1 = w2 + w3; K2 = w4 + w5; K3 = w6 + w7; K4 = w8 + w9;
+# Round keys of the current key (see keyExp and SAESKey):
+# K0 = w0 + w1; K1 = w2 + w3; K2 = w4 + w5; K3 = w6 + w7; K4 = w8 + w9;
 w = [None] * 10
  
 def mult(p1, p2):
     """Multiply two polynomials in GF(2^4)/x^4 + x + 1"""
-    p = 0
-    while p2:
-        # at ith iteration, if ith coeff of p2 is set, add p1*x^i mod x^4+x+1 to result
-        if p2 & 0b1:
-            p ^= p1
-        # compute p1 = p1*x mod x^4+x+1
-        p1 <<= 1
-        # if degree of p1 is > 3, subtract x^4+x+1
-        if p1 & 0b10000:
-            p1 ^= 0b11
-        p2 >>= 1
-    return p & 0b1111
+    return GF16.multiply(p1, p2)
+
+# multiplication by the MixColumns constants
+_MUL2, _MUL4, _MUL9 = GF16.row(2), GF16.row(4), GF16.row(9)
  
 def intToVec(n):
     """Convert a 2-byte integer into a 4-nibble vector"""
@@ -67,19 +66,20 @@ def shiftRow(s):
     
 def mixCol(s):
     """Defined as [1 4; 4 1] * [s[0] s[1]; s[2] s[3]] in GF(2^4)/x^4 + x + 1"""
-    return [s[0] ^ mult(4, s[2]), s[1] ^ mult(4, s[3]), s[2] ^ mult(4, s[0]), s[3] ^ mult(4, s[1])]
+    return [s[0] ^ _MUL4[s[2]], s[1] ^ _MUL4[s[3]], s[2] ^ _MUL4[s[0]], s[3] ^ _MUL4[s[1]]]
 
 def iMixCol(s):
     """Defined as [9 2; 2 9] * [s[0] s[1]; s[2] s[3]] in GF(2^4)/x^4 + x + 1"""
-    return [mult(9, s[0]) ^ mult(2, s[2]), mult(9, s[1]) ^ mult(2, s[3]), mult(9, s[2]) ^ mult(2, s[0]), mult(9, s[3]) ^ mult(2, s[1])]
+    return [_MUL9[s[0]] ^ _MUL2[s[2]], _MUL9[s[1]] ^ _MUL2[s[3]], _MUL9[s[2]] ^ _MUL2[s[0]], _MUL9[s[3]] ^ _MUL2[s[1]]]
  
-def keyExp(key):
-    """Generate the round keys (up to 4 rounds)"""
+def keySchedule(key):
+    """Returns the list w of the round key bytes (up to 4 rounds)"""
     def sub2Nib(b):
         """Swap each nibble and substitute it using sBox"""
         return sBox[b >> 4] + (sBox[b & 0x0f] << 4)
  
     Rcon1, Rcon2, Rcon3, Rcon4 = 0b10000000, 0b00110000, 0b01100000, 0b11000000
+    w = [None] * 10
     w[0] = (key & 0xff00) >> 8
     w[1] = key & 0x00ff
     w[2] = w[0] ^ Rcon1 ^ sub2Nib(w[1])
@@ -90,142 +90,224 @@ def keyExp(key):
     w[7] = w[6] ^ w[5]
     w[8] = w[6] ^ Rcon4 ^ sub2Nib(w[7])
     w[9] = w[8] ^ w[7]
-    
+    return w
+
+# codebooks (256 KB per key and variant) of the most recently used keys; they are kept out of
+# the SAESKey objects so that the getKey cache only holds the small expanded keys
+CODEBOOK_CACHE_SIZE = 16
+_codebooks = collections.OrderedDict()
+_codebooksLock = threading.Lock()
+
+class SAESKey:
+    """Expanded S-AES key. Holds the round key bytes w and the round keys K0..K4 as 16-bit
+    integers and as nibble vectors. Instances are never modified after construction, so they
+    can be shared by threads."""
+
+    def __init__(self, key):
+        self.key = key
+        self.w = keySchedule(key)
+        self.roundKeys = [(self.w[2 * i] << 8) + self.w[2 * i + 1] for i in range(5)]
+        self.roundVecs = [intToVec(k) for k in self.roundKeys]
+
+    def cachedCodebook(self, variant='encrypt'):
+        """(encryption, decryption) codebooks of variant if they are in the codebook cache, else None"""
+        if not isinstance(variant, str):
+            return None
+        with _codebooksLock:
+            books = _codebooks.get((self.key, variant))
+            if books is not None:
+                _codebooks.move_to_end((self.key, variant))
+            return books
+
+    def codebook(self, variant='encrypt'):
+        """(encryption, decryption) codebooks of variant, built on first use and kept in a cache
+        of CODEBOOK_CACHE_SIZE entries; the codebooks of a round structure list are built on
+        every call"""
+        books = self.cachedCodebook(variant)
+        if books is None:
+            books = makeCodebook(variant, self)
+            if isinstance(variant, str):
+                with _codebooksLock:
+                    _codebooks[(self.key, variant)] = books
+                    if len(_codebooks) > CODEBOOK_CACHE_SIZE:
+                        _codebooks.popitem(last=False)
+        return books
+
+    def encrypt(self, ptext, variant='encrypt'):
+        return encryptTable(ptext, variant, self)
+
+    def decrypt(self, ctext, variant='encrypt'):
+        return decryptTable(ctext, variant, self)
+
+@functools.lru_cache(maxsize=4096)
+def getKey(key):
+    """Expanded key object of the 16-bit key, from a cache of the most recently used keys"""
+    return SAESKey(key)
+
+# key used by the functions when no key object is given, set by keyExp
+_current = None
+
+def keyExp(key):
+    """Generate the round keys (up to 4 rounds) and make key the current key"""
+    global _current
+    _current = getKey(key)
+    w[:] = _current.w
+
+def _keyObject(key):
+    """Key object of key: a SAESKey, a 16-bit key or None for the current key"""
+    if key is None:
+        return _current
+    if isinstance(key, SAESKey):
+        return key
+    return getKey(int(key))
 
 def computeRound(subkey0, subkey1, state):
-    # generic round: NS-SR-MC-AK
+    return computeRoundVec(intToVec((subkey0 << 8) + subkey1), state)
+    
+def computeInvRound(subkey0, subkey1, state):
+    return computeInvRoundVec(intToVec((subkey0 << 8) + subkey1), state)
+
+def computeRoundVec(subkey, state):
+    # generic round: NS-SR-MC-AK, subkey is a nibble vector
     state = sub4NibList(sBox, state)
     state = shiftRow(state)
     state = mixCol(state)
-    state = addKey(intToVec((subkey0 << 8) + subkey1), state)
+    state = addKey(subkey, state)
     return state
     
-def computeInvRound(subkey0, subkey1, state):
-    # generic inverse round: AK-MC-SR-NS
-    state = addKey(intToVec((subkey0 << 8) + subkey1), state)
+def computeInvRoundVec(subkey, state):
+    # generic inverse round: AK-MC-SR-NS, subkey is a nibble vector
+    state = addKey(subkey, state)
     state = iMixCol(state)
     state = shiftRow(state)
     state = sub4NibList(sBoxI, state)
     return state
     
  
-def encrypt(ptext):
+def encrypt(ptext, key=None):
     """Encrypt plaintext block (2 rounds)"""
+    K = _keyObject(key).roundVecs
         
     # first AddKey
-    state = addKey(intToVec((w[0] << 8) + w[1]), intToVec(ptext))
+    state = addKey(K[0], intToVec(ptext))
     # first round
-    state = computeRound(w[2], w[3], state)
+    state = computeRoundVec(K[1], state)
     # last round: NS-SR-AK
     state = sub4NibList(sBox, state)
     state = shiftRow(state)
-    state = addKey(intToVec((w[4] << 8) + w[5]), state)
+    state = addKey(K[2], state)
     
     return vecToInt(state)
      
-def encrypt2(ptext):
+def encrypt2(ptext, key=None):
     """Encrypt plaintext block (3 rounds)"""
+    K = _keyObject(key).roundVecs
         
     # first AddKey
-    state = addKey(intToVec((w[0] << 8) + w[1]), intToVec(ptext))
+    state = addKey(K[0], intToVec(ptext))
     # first round
-    state = computeRound(w[2], w[3], state)
+    state = computeRoundVec(K[1], state)
     #second round
-    state = computeRound(w[4], w[5], state)
+    state = computeRoundVec(K[2], state)
     
     # last round: NS-SR-AK
     state = sub4NibList(sBox, state)
     state = shiftRow(state)
-    state = addKey(intToVec((w[6] << 8) + w[7]), state)
+    state = addKey(K[3], state)
     
     return vecToInt(state)
 
-def encrypt3(ptext):
+def encrypt3(ptext, key=None):
     """Encrypt plaintext block (4 rounds)"""
+    K = _keyObject(key).roundVecs
         
     # first AddKey
-    state = addKey(intToVec((w[0] << 8) + w[1]), intToVec(ptext))
+    state = addKey(K[0], intToVec(ptext))
     # first round
-    state = computeRound(w[2], w[3], state)
+    state = computeRoundVec(K[1], state)
     #second round
-    state = computeRound(w[4], w[5], state)
+    state = computeRoundVec(K[2], state)
     #third round
-    state = computeRound(w[6], w[7], state)
+    state = computeRoundVec(K[3], state)
     
     #third round
     state = sub4NibList(sBox, state)
     state = shiftRow(state)
-    state = addKey(intToVec((w[8] << 8) + w[9]), state) 
+    state = addKey(K[4], state) 
     return vecToInt(state)
 
-def encryptLazy(ptext):
+def encryptLazy(ptext, key=None):
     """Encrypt plaintext block (4 rounds)"""
+    K = _keyObject(key).roundVecs
         
     # first AddKey
-    state = addKey(intToVec((w[0] << 8) + w[1]), intToVec(ptext))
+    state = addKey(K[0], intToVec(ptext))
     # first round
     state = sub4NibList(sBox, state)
-    state = addKey(intToVec((w[2] << 8) + w[3]), state) 
+    state = addKey(K[1], state) 
     
     #second round
     state = sub4NibList(sBox, state)
-    state = addKey(intToVec((w[4] << 8) + w[5]), state) 
+    state = addKey(K[2], state) 
     
     #third round
     state = sub4NibList(sBox, state)
-    state = addKey(intToVec((w[6] << 8) + w[7]), state) 
+    state = addKey(K[3], state) 
     
     
     #third round
     state = sub4NibList(sBox, state)
-    state = addKey(intToVec((w[8] << 8) + w[9]), state) 
+    state = addKey(K[4], state) 
     return vecToInt(state)
-def encryptVeryLazy(ptext):
+def encryptVeryLazy(ptext, key=None):
     """Encrypt plaintext block (4 rounds)"""
+    K = _keyObject(key).roundVecs
         
     # first AddKey
-    state = addKey(intToVec((w[0] << 8) + w[1]), intToVec(ptext))
+    state = addKey(K[0], intToVec(ptext))
     # first round
     state = sub4NibList(sBox, state)
-    #state = addKey(intToVec((w[0] << 8) + w[1]), state) 
+    #state = addKey(K[0], state) 
     
     #second round
     state = sub4NibList(sBox, state)
-    state = addKey(intToVec((w[0] << 8) + w[1]), state) 
+    state = addKey(K[0], state) 
     
     #third round
     state = sub4NibList(sBox, state)
-    state = addKey(intToVec((w[0] << 8) + w[1]), state) 
+    state = addKey(K[0], state) 
     
     
     #third round
     state = sub4NibList(sBox, state)
-    state = addKey(intToVec((w[0] << 8) + w[1]), state) 
+    state = addKey(K[0], state) 
     
 
     return vecToInt(state)
-def decrypt(ctext):
+def decrypt(ctext, key=None):
     """Decrypt ciphertext block (2 rounds)"""
+    K = _keyObject(key).roundVecs
     
     # invert last round: AK-SR-NS
-    state = addKey(intToVec((w[4] << 8) + w[5]), intToVec(ctext))
+    state = addKey(K[2], intToVec(ctext))
     state = shiftRow(state)
     state = sub4NibList(sBoxI, state)
     # invert first round
-    state = computeInvRound(w[2], w[3], state)
+    state = computeInvRoundVec(K[1], state)
     # invert first AddKey
-    state = addKey(intToVec((w[0] << 8) + w[1]), state)
+    state = addKey(K[0], state)
     
     return vecToInt(state)
 
     
-def encrypt_foo(ptext):
+def encrypt_foo(ptext, key=None):
     """Encrypt plaintext block"""
+    K = _keyObject(key).roundVecs
         
     # last round: NS-SR-AK
     state = sub4NibList(sBox, intToVec(ptext))
     state = shiftRow(state)
-    state = addKey(intToVec((w[0] << 8) + w[1]), state)
+    state = addKey(K[0], state)
     
     return vecToInt(state)
     
@@ -238,94 +320,260 @@ def find_key(ptext,ctext):
     return key
     
  
-def decrypt_foo(ctext,keyF):
+def decrypt_foo(ctext,keyF,key=None):
     """Decrypt ciphertext block"""
+    K = _keyObject(key).roundVecs
     
     # invert last round: AK-SR-NS
-    state = addKey(intToVec((w[0] << 8) + w[1]), intToVec(ctext))
+    state = addKey(K[0], intToVec(ctext))
     state = shiftRow(state)
     state = sub4NibList(sBoxI, state)
     
     return vecToInt(state)
 
+def decrypt_foo_many(ctexts, key=None):
+    """Decrypt an array of ciphertext blocks encrypted with encrypt_foo, returns a uint16 array"""
+    state = np.asarray(ctexts, dtype=np.uint16) ^ np.uint16(roundKey(0, key))
+    hi, lo = INV_ROUND_TABLES['last']
+    return hi[state >> 8] ^ lo[state & 0xff]
+
+
+# Table-driven implementation.
+# The state is handled as a 16-bit integer: its high byte is the first column [s[0] s[2]]
+# and its low byte the second column [s[1] s[3]], and XORing a round key is AddKey.
+# Every round transform is split into two 256-entry tables indexed by the high and the low
+# byte of the state, whose outputs are XORed: the S-box works on single nibbles and the
+# other transforms are linear.
+
+def roundKey(i, key=None):
+    """Round key Ki as a 16-bit integer"""
+    return _keyObject(key).roundKeys[i]
+
+def _compose(*transforms):
+    """16-bit version of a sequence of state transforms"""
+    def f(x):
+        s = intToVec(x)
+        for t in transforms:
+            s = t(s)
+        return vecToInt(s)
+    return f
+
+def _nibbleMask(values):
+    """Mask of the nibbles that are nonzero in any of values"""
+    m = 0
+    for v in values:
+        m |= v
+    return sum(0xf << i for i in (0, 4, 8, 12) if (m >> i) & 0xf)
+
+def _subTables(*linear, sbox=True):
+    """Byte tables of NibbleSubstitute (if sbox) followed by the linear transforms"""
+    ns = _compose(lambda s: sub4NibList(sBox, s)) if sbox else (lambda x: x)
+    f = _compose(*linear)
+    hi = [f(ns(b << 8) & 0xff00) for b in range(256)]
+    lo = [f(ns(b) & 0x00ff) for b in range(256)]
+    return np.array(hi, dtype=np.uint16), np.array(lo, dtype=np.uint16)
+
+def _invSubTables(*linear, sbox=True):
+    """Byte tables of the linear transforms followed by inverse NibbleSubstitute (if sbox)"""
+    f = _compose(*linear)
+    f_ns = _compose(*(linear + (lambda s: sub4NibList(sBoxI, s),))) if sbox else f
+    hmask = _nibbleMask(f(b << 8) for b in range(256))
+    lmask = _nibbleMask(f(b) for b in range(256))
+    hi = [f_ns(b << 8) & hmask for b in range(256)]
+    lo = [f_ns(b) & lmask for b in range(256)]
+    return np.array(hi, dtype=np.uint16), np.array(lo, dtype=np.uint16)
+
+# linear round components and their inverses
+_LINEAR = {'SR': (shiftRow, shiftRow), 'MC': (mixCol, iMixCol)}
+
+@functools.lru_cache(maxsize=None)
+def componentTables(components):
+    """(tables, inverse tables) of a round made of components, a subsequence of ('NS', 'SR', 'MC')"""
+    if tuple(components) != tuple(c for c in ('NS', 'SR', 'MC') if c in components):
+        raise ValueError('round components must be a subsequence of NS, SR, MC')
+    linear = [c for c in components if c != 'NS']
+    sbox = 'NS' in components
+    return (_subTables(*[_LINEAR[c][0] for c in linear], sbox=sbox),
+            _invSubTables(*[_LINEAR[c][1] for c in reversed(linear)], sbox=sbox))
+
+# (high byte, low byte) tables of the round transforms and of their inverses
+_NAMED_ROUNDS = {'full': ('NS', 'SR', 'MC'), 'last': ('NS', 'SR'), 'sub': ('NS',)}
+ROUND_TABLES = {t: componentTables(c)[0] for t, c in _NAMED_ROUNDS.items()}
+INV_ROUND_TABLES = {t: componentTables(c)[1] for t, c in _NAMED_ROUNDS.items()}
+_ROUND_LISTS = {t: (hi.tolist(), lo.tolist()) for t, (hi, lo) in ROUND_TABLES.items()}
+_INV_ROUND_LISTS = {t: (hi.tolist(), lo.tolist()) for t, (hi, lo) in INV_ROUND_TABLES.items()}
+
+# structure of the encryption variants: first AddKey with K0, then (round transform, round key index).
+# The vectorized functions also accept such lists as variant, with round transforms given
+# either by name or as a tuple of components (see componentTables).
+VARIANTS = {
+    'encrypt':         [('full', 1), ('last', 2)],
+    'encrypt2':        [('full', 1), ('full', 2), ('last', 3)],
+    'encrypt3':        [('full', 1), ('full', 2), ('full', 3), ('last', 4)],
+    'encryptLazy':     [('sub', 1), ('sub', 2), ('sub', 3), ('sub', 4)],
+    'encryptVeryLazy': [('sub', None), ('sub', 0), ('sub', 0), ('sub', 0)],
+}
+
+def encryptTable(ptext, variant='encrypt', key=None):
+    """Encrypt plaintext block with the round tables, variant is a key of VARIANTS"""
+    K = _keyObject(key).roundKeys
+    state = ptext ^ K[0]
+    for t, k in VARIANTS[variant]:
+        hi, lo = _ROUND_LISTS[t]
+        state = hi[state >> 8] ^ lo[state & 0xff]
+        if k is not None:
+            state ^= K[k]
+    return state
+
+def decryptTable(ctext, variant='encrypt', key=None):
+    """Decrypt ciphertext block with the inverse round tables, variant is a key of VARIANTS"""
+    K = _keyObject(key).roundKeys
+    state = ctext
+    for t, k in reversed(VARIANTS[variant]):
+        if k is not None:
+            state ^= K[k]
+        hi, lo = _INV_ROUND_LISTS[t]
+        state = hi[state >> 8] ^ lo[state & 0xff]
+    return state ^ K[0]
+
+# sub2Nib of keyExp for every byte
+_SUB2NIB = np.array([sBox[b >> 4] + (sBox[b & 0x0f] << 4) for b in range(256)], dtype=np.uint16)
+
+def keyExpMany(keys):
+    """Round keys K0..K4 of an array of 16-bit keys, as a (len(keys), 5) uint16 array"""
+    keys = np.asarray(keys, dtype=np.uint16)
+    w = np.empty(keys.shape + (10,), dtype=np.uint16)
+    w[..., 0] = keys >> 8
+    w[..., 1] = keys & 0xff
+    for i, rcon in enumerate((0b10000000, 0b00110000, 0b01100000, 0b11000000), start=1):
+        w[..., 2 * i] = w[..., 2 * i - 2] ^ rcon ^ _SUB2NIB[w[..., 2 * i - 1]]
+        w[..., 2 * i + 1] = w[..., 2 * i] ^ w[..., 2 * i - 1]
+    return (w[..., 0::2] << 8) | w[..., 1::2]
+
+def _roundKeysMany(keys):
+    """Round keys of keys (None for the current key, a SAESKey, a key or an array of keys)
+    as a list of 5 scalars or arrays"""
+    if keys is None or isinstance(keys, (SAESKey, int, np.integer)):
+        return [np.uint16(k) for k in _keyObject(keys).roundKeys]
+    K = keyExpMany(keys)
+    return [K[..., i] for i in range(5)]
+
+def _rounds(variant):
+    """Round structure of variant, a key of VARIANTS or a round structure list"""
+    return VARIANTS[variant] if isinstance(variant, str) else variant
+
+def _components(t):
+    """Components of a round type, a key of _NAMED_ROUNDS or a sequence of components"""
+    return _NAMED_ROUNDS[t] if isinstance(t, str) else tuple(t)
+
+def encrypt_many(ptexts, keys=None, variant='encrypt'):
+    """Encrypt an array of plaintext blocks, returns a uint16 array.
+    keys is None (current key), a key or an array of keys broadcast against ptexts;
+    variant is a key of VARIANTS."""
+    books = keys.cachedCodebook(variant) if isinstance(keys, SAESKey) else None
+    if books is not None:
+        return books[0][ptexts]
+    return encryptRoundKeys(ptexts, _roundKeysMany(keys), variant)
+
+def encryptRoundKeys(ptexts, K, variant='encrypt'):
+    """Encrypt an array of plaintext blocks under already expanded round keys K[0..4]
+    (scalars or arrays broadcast against ptexts, e.g. the columns of keyExpMany)"""
+    state = np.asarray(ptexts, dtype=np.uint16) ^ K[0]
+    for t, k in _rounds(variant):
+        hi, lo = ROUND_TABLES[t] if isinstance(t, str) else componentTables(tuple(t))[0]
+        state = hi[state >> 8] ^ lo[state & 0xff]
+        if k is not None:
+            state ^= K[k]
+    return state
+
+def decrypt_many(ctexts, keys=None, variant='encrypt'):
+    """Decrypt an array of ciphertext blocks, returns a uint16 array.
+    keys is None (current key), a key or an array of keys broadcast against ctexts;
+    variant is a key of VARIANTS."""
+    books = keys.cachedCodebook(variant) if isinstance(keys, SAESKey) else None
+    if books is not None:
+        return books[1][ctexts]
+    return decryptRoundKeys(ctexts, _roundKeysMany(keys), variant)
+
+def decryptRoundKeys(ctexts, K, variant='encrypt'):
+    """Decrypt an array of ciphertext blocks under already expanded round keys K[0..4]"""
+    state = np.asarray(ctexts, dtype=np.uint16)
+    for t, k in reversed(_rounds(variant)):
+        if k is not None:
+            state = state ^ K[k]
+        hi, lo = INV_ROUND_TABLES[t] if isinstance(t, str) else componentTables(tuple(t))[1]
+        state = hi[state >> 8] ^ lo[state & 0xff]
+    return state ^ K[0]
+
+def makeCodebook(variant='encrypt', key=None):
+    """Encryption and decryption codebooks (65536 uint16 entries each) of key (the current
+    key by default): encrypting or decrypting a block is then a single lookup.
+    SAESKey.codebook caches them for the most recently used keys."""
+    book = encrypt_many(np.arange(0x10000, dtype=np.uint16), key, variant)
+    inverse = np.empty_like(book)
+    inverse[book] = np.arange(0x10000, dtype=np.uint16)
+    return book, inverse
+
+def tableThroughput(n=20000, variant='encrypt'):
+    """Print the blocks per second of the scalar, table-driven and codebook encryptions"""
+    scalar = globals()[variant]
+    blocks = [random.getrandbits(16) for _ in range(n)]
+    start = time.perf_counter()
+    book = makeCodebook(variant)[0]
+    setup = time.perf_counter() - start
+    bookList = book.tolist()
+    for name, f in [('scalar', scalar), ('tables', lambda x: encryptTable(x, variant)), ('codebook', bookList.__getitem__)]:
+        start = time.perf_counter()
+        for x in blocks:
+            f(x)
+        print('%-10s %12.0f blocks/s' % (name, n / (time.perf_counter() - start)))
+    start = time.perf_counter()
+    book[np.array(blocks, dtype=np.uint16)]
+    print('%-10s %12.0f blocks/s (codebook built in %.1f ms)' % ('vectorized', n / (time.perf_counter() - start), setup * 1e3))
 
 def hamming (x, y):
     return bin(x ^ y).count('1')
+
+# number of bits set in every byte
+POPCOUNT8 = np.array([bin(b).count('1') for b in range(256)], dtype=np.uint8)
+
+def hammingMany(x, y):
+    """Hamming distances between two arrays of 16-bit blocks"""
+    d = np.asarray(x, dtype=np.uint16) ^ np.asarray(y, dtype=np.uint16)
+    return POPCOUNT8[d >> 8] + POPCOUNT8[d & 0xff]
     
  
 if __name__ == '__main__':
     # Test vectors from "Simplified AES" (Steven Gordon)
     # (http://hw.siit.net/files/001283.pdf)
      
-    hammingD=np.zeros(1000)
-    hammingD3=np.zeros(1000)
-    hammingD4=np.zeros(1000)
-    hammingDl=np.zeros(1000)
-    hammingDvl=np.zeros(1000)
+    variants = ['encrypt', 'encrypt2', 'encrypt3', 'encryptLazy', 'encryptVeryLazy']
+    labels = ['two rounds ', 'three rounds ', 'four rounds ', 'four lazy rounds ', 'four very lazy rounds ']
+    
     key = random.getrandbits(16)
-    keyExp(key)
-    for i in range(1000):
-        plaintext = random.getrandbits(16)
-        error = 1 << random.randrange(16)
-        plaintext2 = plaintext ^ error
-        ciphertext = encrypt(plaintext)
-        ciphertext2 = encrypt(plaintext2)
-        ciphertext3 = encrypt2(plaintext)
-        ciphertext23 = encrypt2(plaintext2)
-        ciphertext4 = encrypt3(plaintext)
-        ciphertext24 = encrypt3(plaintext2)
-        ciphertextl = encryptLazy(plaintext)
-        ciphertext2l = encryptLazy(plaintext2)
-        ciphertextvl = encryptVeryLazy(plaintext)
-        ciphertext2vl = encryptVeryLazy(plaintext2)
-        hammingD[i]=hamming(ciphertext, ciphertext2)
-        hammingD3[i]=hamming(ciphertext3, ciphertext23)
-        hammingD4[i]=hamming(ciphertext4, ciphertext24)
-        hammingDl[i]=hamming(ciphertextl, ciphertext2l)
-        hammingDvl[i]=hamming(ciphertextvl, ciphertext2vl)
-        
+    plaintext = np.random.randint(0, 1 << 16, 1000).astype(np.uint16)
+    error = (1 << np.random.randint(0, 16, 1000)).astype(np.uint16)
+    plaintext2 = plaintext ^ error
+    hammingD = [np.mean(hammingMany(encrypt_many(plaintext, key, v), encrypt_many(plaintext2, key, v))) for v in variants]
     
-    print('Mean fixed key, random plaintext: two rounds '+str(np.mean(hammingD)))
-    print('\t\t\t\t  three rounds '+str(np.mean(hammingD3)))
-    print('\t\t\t\t  four rounds '+str(np.mean(hammingD4)))
-    print('\t\t\t\t  four lazy rounds '+str(np.mean(hammingDl)))
-    print('\t\t\t\t  four very lazy rounds '+str(np.mean(hammingDvl)))
+    print('Mean fixed key, random plaintext: '+labels[0]+str(hammingD[0]))
+    for label, d in zip(labels[1:], hammingD[1:]):
+        print('\t\t\t\t  '+label+str(d))
     
     
-    hammingD2=np.zeros(1000)
-    hammingD23=np.zeros(1000)
-    hammingD24=np.zeros(1000)
-    hammingD2l=np.zeros(1000)
-    hammingD2vl=np.zeros(1000)
     keyToChange = random.getrandbits(16)
-    keyExp(keyToChange)
     plaintextF = random.getrandbits(16)
-    ciphertextF = encrypt(plaintextF)
-    ciphertextF3 = encrypt2(plaintextF)
-    ciphertextF4 = encrypt3(plaintextF)
-    ciphertextFl = encryptLazy(plaintextF)
-    ciphertextFvl = encryptVeryLazy(plaintextF)
-    for i in range(1000):
-        error = 1 << random.randrange(16)
-        key2 = keyToChange ^ error
-        keyExp(key2)
-        ciphertext2C = encrypt(plaintextF)
-        ciphertext2C3 = encrypt2(plaintextF)
-        ciphertext2C4 = encrypt3(plaintextF)
-        ciphertext2Cl = encryptLazy(plaintextF)
-        ciphertext2Cvl = encryptVeryLazy(plaintextF)
-
-        hammingD2[i]=hamming(ciphertextF, ciphertext2C)
-        hammingD23[i]=hamming(ciphertextF3, ciphertext2C3)
-        hammingD24[i]=hamming(ciphertextF4, ciphertext2C4)
-        hammingD2l[i]=hamming(ciphertextFl, ciphertext2Cl)
-        hammingD2vl[i]=hamming(ciphertextFvl, ciphertext2Cvl)
-    
-    print('Mean fixed plaintext, random key: two rounds'+str(np.mean(hammingD2)))
-    print('\t\t\t\t  three rounds '+str(np.mean(hammingD23)))
-    print('\t\t\t\t  four rounds '+str(np.mean(hammingD24)))
-    print('\t\t\t\t  four lazy rounds '+str(np.mean(hammingD2l)))
-    print('\t\t\t\t  four very lazy rounds '+str(np.mean(hammingD2vl)))
+    error = (1 << np.random.randint(0, 16, 1000)).astype(np.uint16)
+    key2 = np.uint16(keyToChange) ^ error
+    hammingD2 = [np.mean(hammingMany(encrypt_many(plaintextF, keyToChange, v), encrypt_many(plaintextF, key2, v))) for v in variants]
+    
+    print('Mean fixed plaintext, random key: '+labels[0]+str(hammingD2[0]))
+    for label, d in zip(labels[1:], hammingD2[1:]):
+        print('\t\t\t\t  '+label+str(d))
+    keyExp(keyToChange)
+
+    print('\n\nThroughput of the two-round encryption\n')
+    tableThroughput()
 ######
 ##########Seconda parte
 #########
@@ -336,32 +584,13 @@ if __name__ == '__main__':
         
     #print(encryption)
     ciphertext = (encryption[0] << 8) + encryption[1]
-    b=bin(int.from_bytes(encryption,byteorder='little'))
-    binario=int.from_bytes(encryption,byteorder='little')
-    lenght=int(len(b)/16)
-    lenght=((lenght+1)*16)+2
-    binario=format(binario,'#0'+str(lenght)+'b')
-    #print(((len(bin(binario))/16)+1)*16+2+'b')
-    #binario=format(binario, '#0'+str(int(((len(bin(binario))/16)+1)*16+2))+'b')
-               
-    #print(binario)
 
     known_plain = 0b0111001001101110
     known_cipher = 0b0010111000001101 
     keyF=find_key(ciphertext,ciphertext)
-    res=list()
-    i=len(binario)
-    while(i>3):
-        #print(binario[i-8:i]+"/"+binario[i-16:i-8])
-        p=binario[i-8:i]+binario[i-16:i-8]
-        #print(p)
-        p=int(p,2)
-        res.append(decrypt_foo(p,keyF))
-        i=i-16
-    r=''
-    for i in res[:-1]:
-        i=format(i,"#018b")
-        r+=chr(int(i[2:10],2))+chr(int(i[10:18],2))
+    # view the payload as big-endian 16-bit blocks, decrypt them all at once
+    blocks = np.frombuffer(encryption, dtype='>u2', count=len(encryption) // 2)
+    r = decrypt_foo_many(blocks).astype('>u2').tobytes().decode('latin-1')
     print(r)
     
     
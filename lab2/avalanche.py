@@ -0,0 +1,66 @@
+# Exact avalanche (diffusion) analysis of S-AES and of reduced or modified variants.
+# Instead of sampling random plaintexts and bit flips, every plaintext (or every key) is
+# encrypted once in a vectorized pass; flipping input bit i is then a permutation of the
+# resulting codebook, and output bit flips are counted with a popcount lookup.
+# Results are 16 x 16 matrices P[i, j] = probability that output bit j flips when input
+# bit i (of the plaintext or of the key) flips; the strict avalanche criterion asks P = 1/2.
+import random
+import numpy as np
+
+from AISC_02_final import VARIANTS, encrypt_many, hammingMany
+
+ALL_BLOCKS = np.arange(0x10000, dtype=np.uint16)
+_BITS = np.arange(16, dtype=np.uint16)
+
+def roundStructure(rounds, components=('NS', 'SR', 'MC'), lastComponents=('NS', 'SR')):
+    """Variant of rounds rounds (1 to 4) made of components, the last one of lastComponents.
+    Round i adds round key Ki, as in encrypt, encrypt2 and encrypt3."""
+    if not 1 <= rounds <= 4:
+        raise ValueError('the key schedule provides round keys for 1 to 4 rounds')
+    return [(tuple(components), i) for i in range(1, rounds)] + [(tuple(lastComponents), rounds)]
+
+def _flipMatrix(book):
+    """P[i, j] for a table book indexed by the 16-bit input"""
+    P = np.empty((16, 16))
+    for i in range(16):
+        diff = book ^ book[ALL_BLOCKS ^ np.uint16(1 << i)]
+        # mean of every output bit of the differences
+        P[i] = ((diff[:, None] >> _BITS) & 1).mean(axis=0)
+    return P
+
+def plaintextAvalanche(variant='encrypt', keys=None):
+    """Exact plaintext avalanche matrix over all the 2^16 plaintexts, averaged over keys
+    (one random key by default). variant is a key of VARIANTS or a round structure."""
+    if keys is None:
+        keys = [random.getrandbits(16)]
+    return np.mean([_flipMatrix(encrypt_many(ALL_BLOCKS, k, variant)) for k in keys], axis=0)
+
+def keyAvalanche(variant='encrypt', ptexts=None):
+    """Exact key avalanche matrix over all the 2^16 keys, averaged over ptexts
+    (one random plaintext by default)."""
+    if ptexts is None:
+        ptexts = [random.getrandbits(16)]
+    return np.mean([_flipMatrix(encrypt_many(np.uint16(p), ALL_BLOCKS, variant)) for p in ptexts], axis=0)
+
+def sacDeviation(P):
+    """Deviation |P - 1/2| from the strict avalanche criterion, with its maximum and mean"""
+    D = np.abs(P - 0.5)
+    return D, D.max(), D.mean()
+
+def meanHamming(variant='encrypt', key=None):
+    """Exact mean Hamming distance between the encryptions of x and x ^ (1 << i),
+    over every plaintext x and input bit i (the quantity sampled by the lab experiment)"""
+    key = random.getrandbits(16) if key is None else key
+    book = encrypt_many(ALL_BLOCKS, key, variant)
+    return np.mean([hammingMany(book, book[ALL_BLOCKS ^ np.uint16(1 << i)]).mean() for i in range(16)])
+
+if __name__ == '__main__':
+    variants = list(VARIANTS) + [('2 rounds without MixColumns', roundStructure(2, ('NS', 'SR'))),
+                                 ('4 rounds without ShiftRow', roundStructure(4, ('NS', 'MC'), ('NS',)))]
+    print('%-28s %10s %10s %10s %10s' % ('', 'plaintext', 'max dev', 'key', 'max dev'))
+    for v in variants:
+        name, variant = v if isinstance(v, tuple) else (v, v)
+        P = plaintextAvalanche(variant)
+        Q = keyAvalanche(variant)
+        print('%-28s %10.3f %10.3f %10.3f %10.3f' % (name, P.sum(axis=1).mean(), sacDeviation(P)[1],
+                                                   Q.sum(axis=1).mean(), sacDeviation(Q)[1]))
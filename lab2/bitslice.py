@@ -0,0 +1,178 @@
+# Bitsliced S-AES: many blocks are enciphered together with bitwise operations only.
+# n blocks are transposed into 16 bit-planes, arrays of n/64 uint64 words where bit j of
+# word w of plane i is bit i of block 64w + j. NibbleSubstitute is evaluated as a Boolean
+# circuit (the algebraic normal form of every output bit of sBox or sBoxI: ANDs of the input
+# planes XORed together), ShiftRow is a permutation of the planes, MixColumns XORs of planes
+# and AddKey XORs the round key planes. There are no table lookups indexed by secret data,
+# so the running time does not depend on the blocks or the keys. The key schedule is
+# bitsliced too, for per-block keys.
+import time
+import random
+import functools
+import numpy as np
+
+from AISC_02_final import (sBox, sBoxI, VARIANTS, SAESKey, _rounds, _components, _keyObject,
+                           componentTables, encrypt_many)
+
+ONES = np.uint64(0xffffffffffffffff)
+
+def toPlanes(blocks):
+    """(16, ceil(n / 64)) uint64 bit-planes of an array of n 16-bit blocks"""
+    blocks = np.asarray(blocks, dtype=np.uint16).ravel()
+    n = -(-len(blocks) // 64) * 64
+    bits = np.zeros((16, n), dtype=np.uint8)
+    bits[:, :len(blocks)] = (blocks[None, :] >> np.arange(16, dtype=np.uint16)[:, None]) & 1
+    return np.packbits(bits, axis=1, bitorder='little').view('<u8').astype(np.uint64)
+
+def fromPlanes(planes, n):
+    """The first n 16-bit blocks of bit-planes"""
+    bits = np.unpackbits(planes.astype('<u8').view(np.uint8), axis=1, bitorder='little')[:, :n]
+    return (bits.astype(np.uint16) << np.arange(16, dtype=np.uint16)[:, None]).sum(axis=0, dtype=np.uint16)
+
+def anf(sbox):
+    """Algebraic normal form of a 4-bit S-box: for every output bit, the list of its monomials
+    (a monomial u is the AND of the input bits set in u, u = 0 is the constant 1)"""
+    forms = []
+    for o in range(4):
+        a = [(s >> o) & 1 for s in sbox]
+        # Moebius transform of the truth table
+        for i in range(4):
+            for x in range(16):
+                if x >> i & 1:
+                    a[x] ^= a[x ^ (1 << i)]
+        forms.append([u for u in range(16) if a[u]])
+    return forms
+
+SBOX_ANF = anf(sBox)
+SBOX_INV_ANF = anf(sBoxI)
+
+def substitute(bits, forms=SBOX_ANF):
+    """Evaluate the S-box circuit forms on the 4 input bit arrays bits[0..3] (of any shape),
+    returns the 4 output bit arrays"""
+    mono = [None] * 16
+    mono[0] = np.full_like(bits[0], ONES)
+    for u in range(1, 16):
+        low = u & -u
+        mono[u] = bits[low.bit_length() - 1] if u == low else mono[u ^ low] & mono[low]
+    out = []
+    for form in forms:
+        acc = mono[form[0]]
+        for u in form[1:]:
+            acc = acc ^ mono[u]
+        out.append(acc)
+    return np.array(out)
+
+def _substitutePlanes(planes, forms):
+    """NibbleSubstitute on the 16 state planes (plane 4j + b is bit b of the nibble at bits 4j..4j+3)"""
+    bits = planes.reshape(4, 4, -1).swapaxes(0, 1)
+    return substitute(bits, forms).swapaxes(0, 1).reshape(16, -1)
+
+@functools.lru_cache(maxsize=None)
+def linearPlanes(components, inverse=False):
+    """For the linear part (SR, MC) of a round made of components, or of its inverse, the input
+    planes XORed into every output plane"""
+    tables = componentTables(tuple(c for c in components if c != 'NS'))[1 if inverse else 0]
+    hi, lo = (t.tolist() for t in tables)
+    images = [hi[(1 << i) >> 8] ^ lo[(1 << i) & 0xff] for i in range(16)]
+    return tuple(tuple(i for i in range(16) if images[i] >> j & 1) for j in range(16))
+
+def _linear(planes, rows):
+    if all(len(r) == 1 for r in rows):
+        # permutation of the planes (ShiftRow)
+        return planes[[r[0] for r in rows]]
+    out = np.empty_like(planes)
+    for j, r in enumerate(rows):
+        out[j] = np.bitwise_xor.reduce(planes[list(r)], axis=0)
+    return out
+
+def constantPlanes(value, bits=16):
+    """(bits, 1) planes of a constant, broadcast against the state planes"""
+    return np.array([[ONES if value >> i & 1 else 0] for i in range(bits)], dtype=np.uint64)
+
+def keySchedulePlanes(keyPlanes):
+    """Bitsliced key schedule: the planes of the round keys K0..K4 of the keys in keyPlanes"""
+    def sub2Nib(b):
+        # swap the nibbles and substitute them
+        return np.concatenate([substitute(b[4:8]), substitute(b[0:4])])
+    # w[i] holds the 8 planes of the byte w_i, low bit first
+    w = [keyPlanes[8:16], keyPlanes[0:8]]
+    for rcon in (0b10000000, 0b00110000, 0b01100000, 0b11000000):
+        w.append(w[-2] ^ constantPlanes(rcon, 8) ^ sub2Nib(w[-1]))
+        w.append(w[-1] ^ w[-2])
+    return [np.concatenate([w[2 * i + 1], w[2 * i]]) for i in range(5)]
+
+def _roundKeyPlanes(keys, words):
+    """Round key planes of keys: None, a key or a SAESKey (constant planes) or an array of one
+    key per block (bitsliced key schedule)"""
+    if keys is None or isinstance(keys, (SAESKey, int, np.integer)):
+        return [constantPlanes(k) for k in _keyObject(keys).roundKeys]
+    K = keySchedulePlanes(toPlanes(keys))
+    if K[0].shape[1] != words:
+        raise ValueError('one key per block is needed')
+    return K
+
+def encryptPlanes(planes, K, variant='encrypt'):
+    """Encrypt the blocks of planes under the round key planes K[0..4]"""
+    state = planes ^ K[0]
+    for t, k in _rounds(variant):
+        c = _components(t)
+        if 'NS' in c:
+            state = _substitutePlanes(state, SBOX_ANF)
+        state = _linear(state, linearPlanes(c))
+        if k is not None:
+            state = state ^ K[k]
+    return state
+
+def decryptPlanes(planes, K, variant='encrypt'):
+    """Decrypt the blocks of planes under the round key planes K[0..4]"""
+    state = planes
+    for t, k in reversed(_rounds(variant)):
+        c = _components(t)
+        if k is not None:
+            state = state ^ K[k]
+        state = _linear(state, linearPlanes(c, inverse=True))
+        if 'NS' in c:
+            state = _substitutePlanes(state, SBOX_INV_ANF)
+    return state ^ K[0]
+
+def encrypt_bitsliced(ptexts, keys=None, variant='encrypt'):
+    """Bitsliced encrypt_many: keys is None (current key), a key or an array of one key per block"""
+    ptexts = np.asarray(ptexts, dtype=np.uint16).ravel()
+    planes = toPlanes(ptexts)
+    return fromPlanes(encryptPlanes(planes, _roundKeyPlanes(keys, planes.shape[1]), variant), len(ptexts))
+
+def decrypt_bitsliced(ctexts, keys=None, variant='encrypt'):
+    """Bitsliced decrypt_many"""
+    ctexts = np.asarray(ctexts, dtype=np.uint16).ravel()
+    planes = toPlanes(ctexts)
+    return fromPlanes(decryptPlanes(planes, _roundKeyPlanes(keys, planes.shape[1]), variant), len(ctexts))
+
+if __name__ == '__main__':
+    import AISC_02_final as saes
+    n = 1 << 20
+    ptexts = np.random.randint(0, 1 << 16, n).astype(np.uint16)
+    key = random.getrandbits(16)
+    keys = np.random.randint(0, 1 << 16, n).astype(np.uint16)
+    sample = range(0, n, 997)
+    for variant in VARIANTS:
+        ctexts = encrypt_bitsliced(ptexts, key, variant)
+        scalar = getattr(saes, variant)
+        exact = all(int(ctexts[i]) == scalar(int(ptexts[i]), key) for i in sample)
+        if variant == 'encrypt':
+            exact = exact and all(saes.decrypt(int(ctexts[i]), key) == ptexts[i] for i in sample)
+        exact = exact and (decrypt_bitsliced(ctexts, key, variant) == ptexts).all()
+        perKey = encrypt_bitsliced(ptexts, keys, variant)
+        exact = exact and (perKey == encrypt_many(ptexts, keys, variant)).all()
+        exact = exact and (decrypt_bitsliced(perKey, keys, variant) == ptexts).all()
+        start = time.perf_counter()
+        encrypt_bitsliced(ptexts, key, variant)
+        sliced = n / (time.perf_counter() - start)
+        start = time.perf_counter()
+        for i in range(2000):
+            scalar(int(ptexts[i]), key)
+        scalarRate = 2000 / (time.perf_counter() - start)
+        start = time.perf_counter()
+        encrypt_many(ptexts, key, variant)
+        tables = n / (time.perf_counter() - start)
+        print('%-16s bit-exact %-5s bitsliced %10.0f blocks/s, scalar %8.0f blocks/s, tables %10.0f blocks/s' % (
+            variant, exact, sliced, scalarRate, tables))
@@ -0,0 +1,255 @@
+# Differential and linear cryptanalysis of the S-AES S-box and of the round structures.
+# The difference distribution table (DDT) and linear approximation table (LAT) of sBox give
+# the nibble transitions; a round maps an input difference (mask) to a distribution over the
+# 2^16 output differences (masks) by multiplying the nibble rows and applying the linear
+# layer, so characteristics and trails through any round structure are products of them
+# (independent round keys assumed). The exact probabilities under a given key come from
+# the codebook. The lazy variants are made of NibbleSubstitute rounds only: every nibble is
+# enciphered independently, so 16 chosen plaintexts give the codebook of every nibble lane
+# and the last round key is ranked nibble by nibble against all the lane functions of the
+# other round key nibbles; the key then follows from the key schedule.
+import time
+import random
+import functools
+import numpy as np
+
+from AISC_02_final import (sBox, sBoxI, VARIANTS, POPCOUNT8, _rounds, _components,
+                           componentTables, encrypt_many, roundKey)
+from avalanche import ALL_BLOCKS
+from key_search import allRoundKeys, filterKeys
+
+SBOX = np.array(sBox, dtype=np.uint8)
+SBOX_INV = np.array(sBoxI, dtype=np.uint8)
+_NIBBLES = np.arange(16, dtype=np.uint8)
+_SHIFTS = np.array([0, 4, 8, 12], dtype=np.uint16)
+
+def ddt(sbox=sBox):
+    """Difference distribution table T[a, b] = #{x : S[x] ^ S[x ^ a] = b}"""
+    S = np.asarray(sbox)
+    x = np.arange(len(S))
+    out = S[x[:, None] ^ x[None, :]] ^ S[None, :]
+    return np.bincount((x[:, None] * len(S) + out).ravel(), minlength=len(S) ** 2).reshape(len(S), len(S))
+
+def lat(sbox=sBox):
+    """Linear approximation table T[a, b] = #{x : a.x = b.S[x]} - 8"""
+    S = np.asarray(sbox)
+    x = np.arange(len(S))
+    parity = POPCOUNT8[(x[:, None, None] & x[None, None, :]) ^ (x[None, :, None] & S[None, None, :])] & 1
+    return len(S) // 2 - parity.sum(axis=2).astype(int)
+
+DDT = ddt()
+LAT = lat()
+
+def _nibbleTransitions(value, T):
+    """(states, weights): the states whose nibbles j have nonzero T[nibble j of value, .]
+    and the products of these entries"""
+    states, weights = np.zeros(1, dtype=np.uint16), np.ones(1)
+    for s in _SHIFTS:
+        row = T[(value >> s) & 0xf]
+        nz = np.flatnonzero(row)
+        states = (states[:, None] | (nz.astype(np.uint16) << s)[None, :]).ravel()
+        weights = (weights[:, None] * row[nz][None, :]).ravel()
+    return states, weights
+
+@functools.lru_cache(maxsize=None)
+def _linearMap(components):
+    """Table over the 2^16 states of the linear part L (SR, MC) of a round"""
+    hi, lo = componentTables(tuple(c for c in components if c != 'NS'))[0]
+    return hi[ALL_BLOCKS >> 8] ^ lo[ALL_BLOCKS & 0xff]
+
+@functools.lru_cache(maxsize=None)
+def _maskMap(components):
+    """Table of the output mask b' of L matching the input mask b, i.e. b = L^T(b')"""
+    table = _linearMap(components)
+    transpose = np.zeros(0x10000, dtype=np.uint16)
+    for i in range(16):
+        v = table[1 << i] & ALL_BLOCKS
+        transpose |= ((POPCOUNT8[v >> 8] ^ POPCOUNT8[v & 0xff]) & 1).astype(np.uint16) << i
+    out = np.empty(0x10000, dtype=np.uint16)
+    out[transpose] = ALL_BLOCKS
+    return out
+
+def _transitions(value, components, linear=False):
+    """Nonzero (output differences, probabilities) of a round for the input difference value,
+    or (output masks, correlations) for the input mask value if linear"""
+    components = tuple(components)
+    if 'NS' in components:
+        states, weights = _nibbleTransitions(value, LAT / 8 if linear else DDT / 16)
+    else:
+        states, weights = np.array([value], dtype=np.uint16), np.ones(1)
+    return (_maskMap if linear else _linearMap)(components)[states], weights
+
+def differentialRound(delta, components=('NS', 'SR', 'MC')):
+    """Probabilities of the output differences of a round for the input difference delta,
+    as an array over the 2^16 differences (AddKey does not change differences)"""
+    out = np.zeros(0x10000)
+    states, weights = _transitions(delta, components)
+    out[states] = weights
+    return out
+
+def linearRound(mask, components=('NS', 'SR', 'MC')):
+    """Correlations of the output masks of a round for the input mask, as an array over
+    the 2^16 masks (AddKey only changes their signs)"""
+    out = np.zeros(0x10000)
+    states, weights = _transitions(mask, components, linear=True)
+    out[states] = weights
+    return out
+
+def characteristicProbability(deltas, variant='encrypt'):
+    """Probability of the differential characteristic deltas[0] -> deltas[1] -> ... through the
+    rounds of variant (a key of VARIANTS or a round structure), one difference per round"""
+    p = 1.0
+    for (t, _), a, b in zip(_rounds(variant), deltas, deltas[1:]):
+        p *= differentialRound(a, _components(t))[b]
+    return p
+
+def trailCorrelation(masks, variant='encrypt'):
+    """Correlation of the linear trail masks[0] -> masks[1] -> ... (piling-up lemma)"""
+    c = 1.0
+    for (t, _), a, b in zip(_rounds(variant), masks, masks[1:]):
+        c *= linearRound(a, _components(t))[b]
+    return c
+
+def _bestTrail(start, variant, rounds, linear, beam):
+    trails = [((start,), 1.0)]
+    for t, _ in _rounds(variant)[:rounds]:
+        extended = []
+        for path, w in trails:
+            states, weights = _transitions(path[-1], _components(t), linear)
+            top = np.argsort(-np.abs(weights), kind='stable')[:beam]
+            extended += [(path + (int(s),), w * float(v)) for s, v in zip(states[top], weights[top])]
+        trails = sorted(extended, key=lambda e: -abs(e[1]))[:beam]
+    return trails[0]
+
+def bestCharacteristic(delta, variant='encrypt', rounds=None, beam=32):
+    """Most probable characteristic from delta through the first rounds of variant found by
+    beam search, returns (differences, probability)"""
+    return _bestTrail(delta, variant, rounds, False, beam)
+
+def bestLinearTrail(mask, variant='encrypt', rounds=None, beam=32):
+    """Linear trail from mask with the largest absolute correlation found by beam search,
+    returns (masks, correlation)"""
+    return _bestTrail(mask, variant, rounds, True, beam)
+
+def differentialProbability(delta, variant='encrypt', key=None):
+    """Exact probabilities of the output differences of variant for the input difference delta
+    under key, over all the 2^16 plaintexts"""
+    book = encrypt_many(ALL_BLOCKS, key, variant)
+    return np.bincount(book ^ book[ALL_BLOCKS ^ np.uint16(delta)], minlength=0x10000) / 0x10000
+
+def linearCorrelation(inMask, outMask, variant='encrypt', key=None):
+    """Exact correlation of inMask.x ^ outMask.E(x) under key, over all the 2^16 plaintexts"""
+    v = (ALL_BLOCKS & np.uint16(inMask)) ^ (encrypt_many(ALL_BLOCKS, key, variant) & np.uint16(outMask))
+    return 1 - 2 * ((POPCOUNT8[v >> 8] ^ POPCOUNT8[v & 0xff]) & 1).mean()
+
+def _checkLazy(variant):
+    structure = _rounds(variant)
+    if any(_components(t) != ('NS',) for t, _ in structure) or structure[-1][1] is None:
+        raise ValueError('the nibble differential attack needs NibbleSubstitute rounds only')
+    return structure
+
+@functools.lru_cache(maxsize=None)
+def _laneModel(structure):
+    """Every function of one nibble lane of a lazy structure (a tuple of rounds) without its last
+    AddKey, over all the values of the round key nibbles it uses. Returns (codes, fixed) sorted
+    by code, where the code packs the 16 outputs of the lane in a 64-bit integer and fixed is
+    the value of the last round key nibble set by the row (K0 or a round key also used before
+    the last round), or -1 if it is free."""
+    last = structure[-1][1]
+    indices = sorted({0} | {k for _, k in structure[:-1] if k is not None})
+    grid = np.indices((16,) * len(indices), dtype=np.uint8).reshape(len(indices), -1)
+    value = dict(zip(indices, grid))
+    state = _NIBBLES[None, :] ^ value[0][:, None]
+    for _, k in structure[:-1]:
+        state = SBOX[state]
+        if k is not None:
+            state = state ^ value[k][:, None]
+    codes = _laneCodes(SBOX[state])
+    fixed = value[last].astype(np.int64) if last in value else np.full(len(codes), -1)
+    order = np.argsort(codes, kind='stable')
+    return codes[order], fixed[order]
+
+def _laneCodes(lanes):
+    """64-bit codes of arrays of 16 nibbles (last axis)"""
+    return np.bitwise_or.reduce(lanes.astype(np.uint64) << (4 * np.arange(16, dtype=np.uint64)), axis=-1)
+
+def differentialAttack(oracle, variant='encryptLazy'):
+    """Rank the last round key nibbles of a variant made of NibbleSubstitute rounds from chosen
+    plaintexts. oracle encrypts a uint16 array of plaintexts. Every nibble lane is an independent
+    4-bit permutation, so the 16 plaintexts n * 0x1111 give its whole codebook (all the input
+    differences at once). A guess k of the last round key nibble is scored by the exact
+    log-likelihood of the lane codebook XOR k over all the values of the other round key nibbles
+    (independent nibbles assumed), -inf when no value explains it.
+    Returns (best last round key, scores) where scores[j, k] is the score of nibble j (from the
+    low nibble) being k."""
+    structure = _checkLazy(variant)
+    codes, fixed = _laneModel(tuple(tuple(r) for r in structure))
+    c = oracle(_NIBBLES.astype(np.uint16) * np.uint16(0x1111))
+    lanes = ((c[None, :] >> _SHIFTS[:, None]) & 0xf).astype(np.uint8)
+    # (nibble, guess) codes of the lane codebooks without the last AddKey
+    targets = _laneCodes(lanes[:, None, :] ^ _NIBBLES[None, :, None])
+    lo, hi = np.searchsorted(codes, targets, 'left'), np.searchsorted(codes, targets, 'right')
+    counts = np.zeros((4, 16))
+    for j in range(4):
+        for k in range(16):
+            f = fixed[lo[j, k]:hi[j, k]]
+            counts[j, k] = np.count_nonzero((f == k) | (f < 0))
+    with np.errstate(divide='ignore'):
+        scores = np.log(counts / len(codes))
+    best = scores.argmax(axis=1)
+    return int(sum(int(k) << s for k, s in zip(best, _SHIFTS.tolist()))), scores
+
+def recoverKey(oracle, variant='encryptLazy', checks=4, maxKeys=1 << 10, seed=None):
+    """Full key recovery on a lazy variant. The last round keys with a finite score of the
+    differential attack (at most maxKeys, best first) are mapped to keys through the inverse key
+    schedule and checked in that order against a few more chosen plaintexts drawn from seed.
+    Returns (consistent keys, rank, best last round key) where rank is the number of keys tried
+    before the first consistent one (the work left to the attacker), or None if the key is not
+    among the candidates."""
+    structure = _checkLazy(variant)
+    rng = np.random.default_rng(seed)
+    best, scores = differentialAttack(oracle, variant)
+    total = sum(scores[j][(ALL_BLOCKS >> _SHIFTS[j]) & 0xf] for j in range(4))
+    order = np.argsort(-total, kind='stable')[:maxKeys]
+    order = order[np.isfinite(total[order])].astype(np.uint16)
+    # the key schedule is invertible: every round key value comes from exactly one key
+    keyOf = np.empty(0x10000, dtype=np.uint16)
+    keyOf[allRoundKeys()[:, structure[-1][1]]] = ALL_BLOCKS
+    ptexts = rng.integers(0, 1 << 16, checks, dtype=np.uint16)
+    keys = filterKeys(keyOf[order], zip(ptexts, oracle(ptexts)), variant)
+    rank = int(np.flatnonzero(np.isin(keyOf[order], keys))[0]) if len(keys) else None
+    return keys, rank, best
+
+if __name__ == '__main__':
+    print('DDT of sBox\n', DDT)
+    print('LAT of sBox\n', LAT)
+    keys = [random.getrandbits(16) for i in range(16)]
+    print('\n%-16s %-30s %10s %10s' % ('', 'best characteristic', 'predicted', 'exact'))
+    for variant in VARIANTS:
+        structure = _rounds(variant)
+        rounds = len(structure) - 1
+        deltas, p = max((bestCharacteristic(a * 0x1000, variant, rounds) for a in range(1, 16)), key=lambda e: e[1])
+        exact = np.mean([differentialProbability(deltas[0], structure[:rounds], k)[deltas[-1]] for k in keys])
+        print('%-16s %-30s %10.4f %10.4f' % (variant, ' -> '.join('%04x' % d for d in deltas), p, exact))
+    print('\n%-16s %-30s %10s %10s' % ('', 'best linear trail', 'predicted', 'exact'))
+    for variant in VARIANTS:
+        structure = _rounds(variant)
+        rounds = len(structure) - 1
+        masks, c = max((bestLinearTrail(a * 0x1000, variant, rounds) for a in range(1, 16)), key=lambda e: abs(e[1]))
+        exact = np.mean([abs(linearCorrelation(masks[0], masks[-1], structure[:rounds], k)) for k in keys])
+        print('%-16s %-30s %10.4f %10.4f' % (variant, ' -> '.join('%04x' % m for m in masks), abs(c), exact))
+    print('(exact: mean over %d keys of the probability or absolute correlation)\n' % len(keys))
+    for variant in ['encryptLazy', 'encryptVeryLazy']:
+        key = random.getrandbits(16)
+        queries = []
+        def oracle(x):
+            queries.append(len(x))
+            return encrypt_many(x, key, variant)
+        start = time.perf_counter()
+        found, rank, best = recoverKey(oracle, variant)
+        elapsed = time.perf_counter() - start
+        # success of the differential attack alone: last round key nibbles ranked first
+        last = roundKey(_rounds(variant)[-1][1], key)
+        nibbles = sum((best ^ last) >> s & 0xf == 0 for s in _SHIFTS.tolist())
+        print('%-16s key %04x: %d/4 last round key nibbles right, found %s after %s wrong keys, %d chosen plaintexts (%.1f ms)' % (
+            variant, key, nibbles, ['%04x' % k for k in found], rank, sum(queries), elapsed * 1e3))
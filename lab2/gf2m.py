@@ -0,0 +1,96 @@
+# Small binary fields GF(2^m) = GF(2)[x]/(modulus) with precomputed tables.
+# Elements are integers whose bits are the polynomial coefficients. The full product table,
+# the inverse table and the rows of the product table (multiplication by a constant, as in
+# MixColumns) are computed once per field, so every operation is a lookup: in lists for the
+# scalar interface and in numpy arrays for the vectorized one.
+import functools
+import numpy as np
+
+def polyMult(p1, p2, m, modulus):
+    """Multiply two polynomials in GF(2^m)/modulus bit by bit (modulus includes x^m)"""
+    p = 0
+    while p2:
+        # at ith iteration, if ith coeff of p2 is set, add p1*x^i mod modulus to result
+        if p2 & 1:
+            p ^= p1
+        # compute p1 = p1*x mod modulus
+        p1 <<= 1
+        if p1 >> m:
+            p1 ^= modulus
+        p2 >>= 1
+    return p
+
+class GF2m:
+    """The field GF(2^m)/modulus, for instance GF2m(4, 0b10011) for GF(2^4)/x^4 + x + 1.
+    Tables are (2^m x 2^m), so m is at most 8."""
+
+    def __init__(self, m, modulus):
+        if not 1 <= m <= 8 or modulus >> m != 1:
+            raise ValueError('modulus must have degree m, with 1 <= m <= 8')
+        self.m = m
+        self.modulus = modulus
+        self.size = 1 << m
+        x = np.arange(self.size)
+        # product table, built for every pair at once with the bit-serial algorithm
+        p, a = np.zeros((self.size, self.size), dtype=np.int64), np.broadcast_to(x[:, None], (self.size, self.size))
+        for i in range(m):
+            p ^= np.where((x[None, :] >> i) & 1, a, 0)
+            a = a << 1
+            a = np.where(a >> m, a ^ modulus, a)
+        self.mul = p.astype(np.uint8)
+        if (self.mul[1:, 1:] == 0).any():
+            raise ValueError('modulus is not irreducible')
+        self.inv = np.zeros(self.size, dtype=np.uint8)
+        a, b = np.nonzero(self.mul == 1)
+        self.inv[a] = b
+        self._mul = self.mul.tolist()
+        self._inv = self.inv.tolist()
+
+    def multiply(self, a, b):
+        """Product of two elements"""
+        return self._mul[a][b]
+
+    def inverse(self, a):
+        """Multiplicative inverse of a nonzero element"""
+        if a == 0:
+            raise ZeroDivisionError('0 has no inverse')
+        return self._inv[a]
+
+    def divide(self, a, b):
+        return self._mul[a][self.inverse(b)]
+
+    def power(self, a, n):
+        """a^n by square and multiply, negative n uses the inverse"""
+        if n < 0:
+            a, n = self.inverse(a), -n
+        r = 1
+        while n:
+            if n & 1:
+                r = self._mul[r][a]
+            a = self._mul[a][a]
+            n >>= 1
+        return r
+
+    def row(self, c):
+        """Multiplication by the constant c as a list indexed by the element"""
+        return self._mul[c]
+
+    def multiplyMany(self, a, b):
+        """Elementwise product of arrays (or scalars) of elements, as a uint8 array"""
+        return self.mul[np.asarray(a, dtype=np.intp), np.asarray(b, dtype=np.intp)]
+
+    def inverseMany(self, a):
+        """Elementwise inverse of an array of elements, 0 is mapped to 0"""
+        return self.inv[np.asarray(a, dtype=np.intp)]
+
+    def rowMany(self, c):
+        """Multiplication by the constant c as a uint8 array indexed by the element"""
+        return self.mul[c]
+
+@functools.lru_cache(maxsize=None)
+def field(m, modulus):
+    """Shared table set of GF(2^m)/modulus"""
+    return GF2m(m, modulus)
+
+# field of S-AES MixColumns and of the S-box
+GF16 = field(4, 0b10011)
@@ -0,0 +1,64 @@
+# Exhaustive key search for S-AES from known plaintext/ciphertext pairs.
+# All the 2^16 keys are expanded at once into a (keys x 5) array of round keys; the
+# first known plaintext is encrypted under every key in one vectorized pass and the
+# surviving candidates are filtered against each additional pair.
+import os
+import time
+import functools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from AISC_02_final import VARIANTS, keyExpMany, encryptRoundKeys
+
+ALL_KEYS = np.arange(0x10000, dtype=np.uint16)
+
+@functools.lru_cache(maxsize=1)
+def allRoundKeys():
+    """Round keys K0..K4 of every 16-bit key, as a read-only (65536 x 5) uint16 array"""
+    K = keyExpMany(ALL_KEYS)
+    K.setflags(write=False)
+    return K
+
+def filterKeys(keys, pairs, variant='encrypt'):
+    """Returns the keys (array of 16-bit keys) consistent with every (plaintext, ciphertext) pair"""
+    keys = np.asarray(keys, dtype=np.uint16)
+    K = allRoundKeys()[keys]
+    for ptext, ctext in pairs:
+        match = encryptRoundKeys(ptext, K.T, variant) == ctext
+        keys, K = keys[match], K[match]
+        if len(keys) == 0:
+            break
+    return keys
+
+def _searchRange(start, stop, pairs, variant):
+    return filterKeys(ALL_KEYS[start:stop], pairs, variant)
+
+def searchKeys(pairs, variant='encrypt', workers=None):
+    """Exhaustive search of the keys of variant consistent with the known pairs.
+    With workers > 1 the key space is split in equal ranges searched by a process pool.
+    Returns the candidate keys as a uint16 array (more than one if the pairs do not
+    determine the key)."""
+    if variant not in VARIANTS:
+        raise ValueError('unknown variant ' + variant)
+    pairs = [(int(p), int(c)) for p, c in pairs]
+    if not workers or workers == 1:
+        return filterKeys(ALL_KEYS, pairs, variant)
+    bounds = np.linspace(0, 0x10000, workers + 1).astype(int)
+    with ProcessPoolExecutor(workers) as pool:
+        parts = pool.map(_searchRange, bounds[:-1], bounds[1:], [pairs] * workers, [variant] * workers)
+        return np.concatenate(list(parts))
+
+if __name__ == '__main__':
+    import random
+    from AISC_02_final import encrypt_many
+    for variant in VARIANTS:
+        key = random.getrandbits(16)
+        ptexts = np.random.randint(0, 1 << 16, 4).astype(np.uint16)
+        pairs = list(zip(ptexts, encrypt_many(ptexts, key, variant)))
+        start = time.perf_counter()
+        found = searchKeys(pairs, variant)
+        print('%-16s key %04x candidates %s (%.1f ms)' % (variant, key, ['%04x' % k for k in found[:8]],
+                                                          (time.perf_counter() - start) * 1e3))
+    start = time.perf_counter()
+    found = searchKeys(pairs, variant, workers=os.cpu_count())
+    print('%d processes: %.1f ms' % (os.cpu_count(), (time.perf_counter() - start) * 1e3))
@@ -0,0 +1,202 @@
+# Modes of operation of S-AES over byte buffers and files: ECB, CBC and CTR.
+# A bytes-like object of even length is viewed as big-endian 16-bit blocks with np.frombuffer,
+# without copying it, and the blocks are enciphered by gathers in the codebooks of the key.
+# The ciphertext is written into one preallocated bytearray. ECB and CBC pad the message to a
+# whole number of blocks (PKCS#7 with 2-byte blocks: 1 or 2 bytes equal to the pad length);
+# CTR needs no padding. CBC and CTR output start with the 16-bit IV.
+# CBC encryption is sequential (every block depends on the previous ciphertext), the other
+# directions are vectorized. The CTR counter is 16 bits and wraps around: a key/IV pair must
+# not be used for more than 2^16 blocks.
+#
+# usage: python modes.py (round trip and throughput of every mode)
+import os
+import time
+import random
+import numpy as np
+
+from AISC_02_final import SAESKey, getKey
+
+MODES = ('ECB', 'CBC', 'CTR')
+BLOCK_SIZE = 2
+
+def blocks(data):
+    """Big-endian uint16 view of a bytes-like object of even length, no copy is made"""
+    return np.frombuffer(data, dtype='>u2')
+
+def pad(data):
+    """Pad data to a multiple of the block size (1 or 2 bytes equal to the pad length)"""
+    n = BLOCK_SIZE - len(data) % BLOCK_SIZE
+    return bytes(data) + bytes([n]) * n
+
+def unpad(data):
+    """Remove the padding added by pad, raises ValueError if it is malformed"""
+    if len(data) == 0 or len(data) % BLOCK_SIZE:
+        raise ValueError('padded data must be a non-empty multiple of the block size')
+    n = data[-1]
+    if not 1 <= n <= BLOCK_SIZE or any(b != n for b in data[-n:]):
+        raise ValueError('bad padding')
+    return data[:-n]
+
+def _key(key):
+    return key if isinstance(key, SAESKey) else getKey(int(key))
+
+def _mode(mode):
+    mode = mode.upper()
+    if mode not in MODES:
+        raise ValueError('unknown mode ' + mode)
+    return mode
+
+def _iv(mode, iv):
+    """(iv, header) of mode, a random IV if none is given"""
+    if mode == 'ECB':
+        return 0, b''
+    iv = random.getrandbits(16) if iv is None else int(iv) & 0xffff
+    return iv, iv.to_bytes(BLOCK_SIZE, 'big')
+
+def _encryptBlocks(P, out, book, mode, state):
+    """Encrypt the blocks P into the block view out, returns the chaining state
+    (previous ciphertext block for CBC, counter for CTR)"""
+    if mode == 'ECB':
+        out[:] = book[P]
+    elif mode == 'CTR':
+        out[:] = P ^ book[(state + np.arange(len(P))) & 0xffff]
+        state += len(P)
+    else:
+        table = book.tolist()
+        C = []
+        for p in P.tolist():
+            state = table[p ^ state]
+            C.append(state)
+        out[:] = C
+    return state
+
+def _decryptBlocks(C, out, book, inverse, mode, state):
+    """Decrypt the blocks C into the block view out, returns the chaining state"""
+    if len(C) == 0:
+        return state
+    if mode == 'ECB':
+        out[:] = inverse[C]
+    elif mode == 'CTR':
+        out[:] = C ^ book[(state + np.arange(len(C))) & 0xffff]
+        state += len(C)
+    else:
+        out[0] = inverse[C[0]] ^ state
+        out[1:] = inverse[C[1:]] ^ C[:-1]
+        state = int(C[-1])
+    return state
+
+def _ctrTail(tail, book, counter):
+    """CTR encryption (or decryption) of a last incomplete block of 1 byte"""
+    return bytes(b ^ (int(book[counter & 0xffff]) >> 8) for b in tail)
+
+def encryptBytes(data, key, mode='ECB', iv=None, variant='encrypt'):
+    """Encrypt a bytes-like object under key (16-bit integer or SAESKey) in mode, returns a
+    bytearray (IV followed by the ciphertext for CBC and CTR)"""
+    key, mode = _key(key), _mode(mode)
+    book = key.codebook(variant)[0]
+    state, header = _iv(mode, iv)
+    data = memoryview(data).cast('B')
+    n = len(data) - len(data) % BLOCK_SIZE
+    tail = bytes(data[n:]) if mode == 'CTR' else pad(data[n:])
+    out = bytearray(len(header) + n + len(tail))
+    out[:len(header)] = header
+    view = np.frombuffer(out, dtype='>u2', offset=len(header), count=n // BLOCK_SIZE)
+    state = _encryptBlocks(blocks(data[:n]), view, book, mode, state)
+    if mode == 'CTR':
+        out[len(header) + n:] = _ctrTail(tail, book, state)
+    else:
+        _encryptBlocks(blocks(tail), np.frombuffer(out, dtype='>u2', offset=len(header) + n), book, mode, state)
+    return out
+
+def decryptBytes(data, key, mode='ECB', variant='encrypt'):
+    """Decrypt the output of encryptBytes, returns a bytearray"""
+    key, mode = _key(key), _mode(mode)
+    book, inverse = key.codebook(variant)
+    data = memoryview(data).cast('B')
+    state = 0
+    if mode != 'ECB':
+        if len(data) < BLOCK_SIZE:
+            raise ValueError('missing IV')
+        state, data = int.from_bytes(data[:BLOCK_SIZE], 'big'), data[BLOCK_SIZE:]
+    n = len(data) - len(data) % BLOCK_SIZE
+    if mode != 'CTR' and (n != len(data) or n == 0):
+        raise ValueError('ciphertext must be a non-empty multiple of the block size')
+    out = bytearray(len(data))
+    state = _decryptBlocks(blocks(data[:n]), np.frombuffer(out, dtype='>u2', count=n // BLOCK_SIZE),
+                           book, inverse, mode, state)
+    if mode == 'CTR':
+        out[n:] = _ctrTail(data[n:], book, state)
+        return out
+    return unpad(out)
+
+def encryptFile(inPath, outPath, key, mode='ECB', iv=None, variant='encrypt', chunkSize=1 << 20):
+    """Encrypt the file inPath into outPath, reading chunkSize bytes at a time into one
+    reused buffer; the output is the same as encryptBytes on the whole file"""
+    key, mode = _key(key), _mode(mode)
+    book = key.codebook(variant)[0]
+    state, header = _iv(mode, iv)
+    chunkSize = max(chunkSize - chunkSize % BLOCK_SIZE, BLOCK_SIZE)
+    buf, out = bytearray(chunkSize), bytearray(chunkSize)
+    with open(inPath, 'rb') as fin, open(outPath, 'wb') as fout:
+        size = os.fstat(fin.fileno()).st_size
+        remaining = size - size % BLOCK_SIZE
+        fout.write(header)
+        while remaining:
+            n = min(chunkSize, remaining)
+            fin.readinto(memoryview(buf)[:n])
+            state = _encryptBlocks(blocks(memoryview(buf)[:n]), np.frombuffer(out, dtype='>u2', count=n // BLOCK_SIZE),
+                                   book, mode, state)
+            fout.write(memoryview(out)[:n])
+            remaining -= n
+        tail = fin.read()
+        if mode == 'CTR':
+            fout.write(_ctrTail(tail, book, state))
+        else:
+            last = np.empty(len(pad(tail)) // BLOCK_SIZE, dtype='>u2')
+            _encryptBlocks(blocks(pad(tail)), last, book, mode, state)
+            fout.write(last.tobytes())
+
+def decryptFile(inPath, outPath, key, mode='ECB', variant='encrypt', chunkSize=1 << 20):
+    """Decrypt the file inPath written by encryptFile (or encryptBytes) into outPath"""
+    key, mode = _key(key), _mode(mode)
+    book, inverse = key.codebook(variant)
+    chunkSize = max(chunkSize - chunkSize % BLOCK_SIZE, BLOCK_SIZE)
+    buf, out = bytearray(chunkSize), bytearray(chunkSize)
+    with open(inPath, 'rb') as fin, open(outPath, 'wb') as fout:
+        size = os.fstat(fin.fileno()).st_size
+        state = 0
+        if mode != 'ECB':
+            if size < BLOCK_SIZE:
+                raise ValueError('missing IV')
+            state = int.from_bytes(fin.read(BLOCK_SIZE), 'big')
+            size -= BLOCK_SIZE
+        if mode != 'CTR' and (size % BLOCK_SIZE or size == 0):
+            raise ValueError('ciphertext must be a non-empty multiple of the block size')
+        # the last block of ECB and CBC is kept back to remove the padding
+        remaining = size - size % BLOCK_SIZE - (0 if mode == 'CTR' else BLOCK_SIZE)
+        while remaining:
+            n = min(chunkSize, remaining)
+            fin.readinto(memoryview(buf)[:n])
+            state = _decryptBlocks(blocks(memoryview(buf)[:n]), np.frombuffer(out, dtype='>u2', count=n // BLOCK_SIZE),
+                                   book, inverse, mode, state)
+            fout.write(memoryview(out)[:n])
+            remaining -= n
+        tail = fin.read()
+        if mode == 'CTR':
+            fout.write(_ctrTail(tail, book, state))
+        else:
+            last = np.empty(1, dtype='>u2')
+            _decryptBlocks(blocks(tail), last, book, inverse, mode, state)
+            fout.write(unpad(last.tobytes()))
+
+if __name__ == '__main__':
+    key = random.getrandbits(16)
+    message = os.urandom(1 << 22)
+    for mode in MODES:
+        start = time.perf_counter()
+        ctext = encryptBytes(message, key, mode)
+        middle = time.perf_counter()
+        ptext = decryptBytes(ctext, key, mode)
+        end = time.perf_counter()
+        print('%s round trip %s, encryption %.1f MB/s, decryption %.1f MB/s' % (
+            mode, ptext == message, len(message) / (middle - start) / 1e6, len(message) / (end - middle) / 1e6))
@@ -1,10 +1,15 @@
 import sys
 import os
 import time
+import math
 from random import randrange, getrandbits
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.backends import default_backend
 import random
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from numbertheory import egcd, modinv
 
 # 2048-bit group of order q based on Z_p^* with p=2*q+1, p,q primes
 # p, q, g as recommended in RFC 7919 for Diffie-Hellman key exchange
@@ -18,14 +23,15 @@ qDH = 0x7FFFFFFFFFFFFFFFD6FC2A2C515DA54D57EE2B10139E9E78EC5CE2C1E7169B4AD4F09B20
 
 
 
-def encryptAESCTR(key, plaintext):
+def encryptAESCTR(key, plaintext, iv=None):
     """Encrypts plaintext using AES-CTR mode with given key
        key:       bytes-like object, should be 16, 24, or 32 bytes long
        plaintext: bytes-like object
+       iv:        16 bytes, securely generated if not given
        return iv, ciphertext as bytes-like objects
     """
     # 128-bit iv, securely generated
-    iv = os.urandom(16)
+    iv = iv or os.urandom(16)
     cipher = Cipher(algorithms.AES(key), modes.CTR(iv), backend=default_backend())
     encryptor = cipher.encryptor()
     ciphertext = encryptor.update(plaintext) + encryptor.finalize()
@@ -42,6 +48,116 @@ def decryptAESCTR(key, iv, ciphertext):
     cipher = Cipher(algorithms.AES(key), modes.CTR(iv), backend=default_backend())
     decryptor = cipher.decryptor()
     return decryptor.update(ciphertext) + decryptor.finalize()
+
+
+def _updateStream(context, src, dst, chunk_size):
+    """Runs context (an AES-CTR encryptor or decryptor) over the binary stream src in chunks
+       of chunk_size bytes and writes the result to dst, through two reused buffers.
+       return the number of bytes processed
+    """
+    buf = bytearray(chunk_size)
+    # update_into needs room for a block more than the input
+    out = bytearray(chunk_size + 15)
+    view, outview = memoryview(buf), memoryview(out)
+    total = 0
+    while True:
+        n = src.readinto(buf)
+        if not n:
+            break
+        m = context.update_into(view[:n], out)
+        dst.write(outview[:m])
+        total += n
+    m = context.finalize()
+    dst.write(m)
+    return total
+
+
+def encryptAESCTRStream(key, src, dst, chunk_size=1 << 20):
+    """Encrypts the binary stream src into dst using AES-CTR mode with given key, in chunks
+       key:        bytes-like object, should be 16, 24, or 32 bytes long
+       src:        readable binary stream (with readinto), e.g. a file opened with 'rb'
+       dst:        writable binary stream, receives the iv followed by the ciphertext
+       chunk_size: bytes read at a time, memory use does not depend on the input size
+       return iv, number of bytes encrypted
+    """
+    iv = os.urandom(16)
+    cipher = Cipher(algorithms.AES(key), modes.CTR(iv), backend=default_backend())
+    dst.write(iv)
+    return iv, _updateStream(cipher.encryptor(), src, dst, chunk_size)
+
+
+def decryptAESCTRStream(key, src, dst, chunk_size=1 << 20):
+    """Decrypts the output of encryptAESCTRStream (iv header, then ciphertext) from src into dst
+       return number of bytes decrypted
+    """
+    iv = src.read(16)
+    if len(iv) != 16:
+        raise ValueError('missing iv')
+    cipher = Cipher(algorithms.AES(key), modes.CTR(iv), backend=default_backend())
+    return _updateStream(cipher.decryptor(), src, dst, chunk_size)
+
+
+def _ctrSegment(key, iv, src, out, start, stop):
+    """Encrypts src[start:stop] into out[start:stop] with AES-CTR, start is a multiple of 16:
+       the counter of the segment is the iv plus its offset in blocks, modulo 2^128
+    """
+    counter = (int.from_bytes(iv, byteorder='big') + start // 16) % (1 << 128)
+    cipher = Cipher(algorithms.AES(key), modes.CTR(counter.to_bytes(16, byteorder='big')), backend=default_backend())
+    encryptor = cipher.encryptor()
+    with memoryview(src) as data, memoryview(out) as view:
+        # update_into wants room for a block more than the input, CTR only writes stop-start bytes
+        encryptor.update_into(data[start:stop], view[start:])
+    encryptor.finalize()
+
+
+def encryptAESCTRParallel(key, plaintext, iv=None, workers=None, segment_size=1 << 22):
+    """Encrypts plaintext using AES-CTR mode with given key, split in segments encrypted by a
+       thread pool directly into one output buffer. Same output as encryptAESCTR with the same iv.
+       key:          bytes-like object, should be 16, 24, or 32 bytes long
+       plaintext:    bytes-like object
+       iv:           16 bytes, securely generated if not given
+       workers:      number of threads (default: one per core)
+       segment_size: bytes per segment, rounded down to a multiple of 16
+       return iv, ciphertext as bytearray
+    """
+    iv = iv or os.urandom(16)
+    n = len(plaintext)
+    segment_size = max(segment_size - segment_size % 16, 16)
+    out = bytearray(n + 15)
+    starts = range(0, n, segment_size)
+    with ThreadPoolExecutor(workers or os.cpu_count()) as pool:
+        for f in [pool.submit(_ctrSegment, key, iv, plaintext, out, i, min(i + segment_size, n)) for i in starts]:
+            f.result()
+    del out[n:]
+    return (iv, out)
+
+
+def decryptAESCTRParallel(key, iv, ciphertext, workers=None, segment_size=1 << 22):
+    """Decrypts ciphertext encrypted using AES-CTR mode with given key and iv, in parallel
+       (CTR decryption is the same operation as encryption)
+       return plaintext as bytearray
+    """
+    return encryptAESCTRParallel(key, ciphertext, iv, workers, segment_size)[1]
+
+
+def encryptAESCTRFile(key, in_path, out_path, chunk_size=1 << 20):
+    """Encrypts the file in_path into out_path (iv header, then ciphertext)
+       return iv, throughput in MB/s
+    """
+    start_time = time.perf_counter()
+    with open(in_path, 'rb') as src, open(out_path, 'wb') as dst:
+        iv, n = encryptAESCTRStream(key, src, dst, chunk_size)
+    return iv, n / (time.perf_counter() - start_time) / 1e6
+
+
+def decryptAESCTRFile(key, in_path, out_path, chunk_size=1 << 20):
+    """Decrypts the file in_path written by encryptAESCTRFile into out_path
+       return throughput in MB/s
+    """
+    start_time = time.perf_counter()
+    with open(in_path, 'rb') as src, open(out_path, 'wb') as dst:
+        n = decryptAESCTRStream(key, src, dst, chunk_size)
+    return n / (time.perf_counter() - start_time) / 1e6
     
 
 
@@ -54,7 +170,8 @@ def generate_prime_candidate(length):
         return an odd integer in range(sqrt(2)*2^(length-1), 2^length)
     """
     mask = (1 << length) - 1
-    offs = 1.4142135623731 * (1 << (length-1))
+    # sqrt(2)*2^(length-1) in integer arithmetic, floats overflow above 1024 bits
+    offs = math.isqrt(1 << (2*length - 1)) + 1
     p = 0
     while p < offs:
         # generate big integer from random bytes
@@ -66,6 +183,121 @@ def generate_prime_candidate(length):
     return p
     
     
+def small_primes(limit):
+    """ Primes below limit, with the sieve of Eratosthenes
+        Args:
+            limit -- int -- upper bound (excluded)
+        return the list of primes < limit
+    """
+    sieve = bytearray([1]) * limit
+    sieve[:2] = b'\x00\x00'
+    for i in range(2, int(limit ** 0.5) + 1):
+        if sieve[i]:
+            sieve[i*i::i] = bytes(len(range(i*i, limit, i)))
+    return [i for i in range(limit) if sieve[i]]
+
+# odd primes used to sieve the prime candidates
+SMALL_PRIMES = small_primes(1 << 14)[1:]
+
+
+def miller_rabin(n, rounds=40):
+    """ Miller-Rabin probabilistic primality test
+        Args:
+            n -- int -- the integer to test
+            rounds -- int -- the number of random bases
+        return False if n is composite, True if n is prime with error probability at most 4^-rounds
+    """
+    if n < 4:
+        return n in (2, 3)
+    if n % 2 == 0:
+        return False
+    # n - 1 = d * 2^s with d odd
+    s = ((n - 1) & (1 - n)).bit_length() - 1
+    d = (n - 1) >> s
+    for _ in range(rounds):
+        x = pow(randrange(2, n - 1), d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def is_prime(n, rounds=40):
+    """ Primality test: trial division by the small primes, then Miller-Rabin """
+    for p in SMALL_PRIMES:
+        if n % p == 0:
+            return n == p
+    return n == 2 or (n > 2 and miller_rabin(n, rounds))
+
+
+def generate_prime(length, rounds=40, e=None, window=None):
+    """ Generate a prime via sieving and Miller-Rabin
+        The odd integers base, base+2, ... following a random candidate are sieved by windows:
+        the residues of base modulo the small primes are computed once and then updated by
+        addition when the window moves, so no trial division is done per candidate.
+        Args:
+            length -- int -- the length of the prime, in bits
+            rounds -- int -- Miller-Rabin rounds of the candidates surviving the sieve
+            e -- int -- if given, also reject p such that p-1 is a multiple of e (for RSA, e prime)
+            window -- int -- number of odd integers sieved at once
+        return a prime in range(sqrt(2)*2^(length-1), 2^length)
+    """
+    window = window or 4 * length
+    while True:
+        base = generate_prime_candidate(length)
+        # p divides a candidate >= base only if it is not the prime p itself
+        primes = [p for p in SMALL_PRIMES if p * p <= base]
+        # candidates base + 2*i0 = target modulo p are removed
+        targets = [0] * len(primes)
+        if e:
+            primes.append(e)
+            targets.append(1)
+        residues = [base % p for p in primes]
+        step = [2 * window % p for p in primes]
+        while base < 1 << length:
+            sieve = bytearray([1]) * window
+            for p, r, t in zip(primes, residues, targets):
+                i0 = (t - r) * ((p + 1) >> 1) % p
+                sieve[i0::p] = bytes(len(range(i0, window, p)))
+            i = sieve.find(1)
+            while i >= 0:
+                n = base + 2 * i
+                if n >> length:
+                    break
+                if miller_rabin(n, rounds):
+                    return n
+                i = sieve.find(1, i + 1)
+            residues = [(r + s) % p for p, r, s in zip(primes, residues, step)]
+            base += 2 * window
+
+
+def generate_rsa_primes(keylen, e=65537, rounds=40, executor=None):
+    """ Generate the primes p and q of a keylen-bit RSA modulus, concurrently in two processes
+        Args:
+            keylen -- int -- the length of N = p*q, in bits
+            e -- int -- public exponent, coprime with p-1 and q-1
+            rounds -- int -- Miller-Rabin rounds
+            executor -- an existing process pool to use, otherwise a new one is started
+        return p, q, distinct primes such that N = p*q has exactly keylen bits
+    """
+    pool = executor or ProcessPoolExecutor(2)
+    try:
+        while True:
+            fp = pool.submit(generate_prime, keylen // 2, rounds, e)
+            fq = pool.submit(generate_prime, keylen - keylen // 2, rounds, e)
+            p, q = fp.result(), fq.result()
+            if p != q:
+                return p, q
+    finally:
+        if executor is None:
+            pool.shutdown()
+    
+    
 
     
 def encodeText(s, bitlen):
@@ -91,20 +323,83 @@ def decodeText(m, bitlen):
         mbytes += x.to_bytes(bytelen, byteorder='little')
     return mbytes.rstrip(b'\x00').decode('utf-8')
 
-def egcd(a, b):
-    if a==0:
-        return (b, 0, 1)
-    else:
-        g,x,y = egcd(b%a,a)
-        return (g, y-(b//a)*x, x)
+class RSAKey:
+    """ RSA key pair, the private exponent and the CRT parameters are computed once
+        Args:
+            p, q -- int -- distinct primes
+            e -- int -- public exponent, coprime with p-1 and q-1
+    """
+
+    def __init__(self, p, q, e=65537):
+        self.p, self.q, self.e = p, q, e
+        self.N = p*q
+        self.bitlen = self.N.bit_length()
+        phi = (p-1)*(q-1)
+        g, x, _ = egcd(e, phi)
+        if g != 1:
+            raise ValueError('e is not coprime with (p-1)*(q-1)')
+        self.d = x % phi
+        self.dP = self.d % (p-1)
+        self.dQ = self.d % (q-1)
+        self.qInv = modinv(q, p)
+
+    @classmethod
+    def generate(cls, keylen=2048, e=65537, **kwargs):
+        """ New key with a keylen-bit modulus (see generate_rsa_primes for kwargs) """
+        p, q = generate_rsa_primes(keylen, e, **kwargs)
+        return cls(p, q, e)
+
+    def encrypt(self, m):
+        return pow(m, self.e, self.N)
+
+    def decrypt(self, c):
+        """ Decrypt with the Chinese Remainder Theorem: two exponentiations modulo p and q
+            with half-size exponents, recombined with Garner's formula """
+        m1 = pow(c, self.dP, self.p)
+        m2 = pow(c, self.dQ, self.q)
+        h = self.qInv * (m1 - m2) % self.p
+        return m2 + h*self.q
+
+    def decrypt_plain(self, c):
+        """ Decrypt without the CRT, pow(c, d, N) """
+        return pow(c, self.d, self.N)
+
+    def sign(self, m):
+        """ Textbook RSA signature of the integer m < N, computed with the CRT """
+        return self.decrypt(m)
+
+    def verify(self, m, s):
+        return pow(s, self.e, self.N) == m
+
+    def decrypt_many(self, blocks, executor=None, workers=None):
+        """ Decrypt a list of blocks in a process pool
+            Args:
+                blocks -- list of int -- ciphertexts, e.g. encrypted blocks of encodeText
+                executor -- an existing process pool to use, otherwise a new one is started
+                workers -- int -- number of processes of the new pool (default: one per core)
+            return the list of plaintexts, in order
+        """
+        pool = executor or ProcessPoolExecutor(workers)
+        try:
+            chunksize = max(1, len(blocks) // (4 * (workers or os.cpu_count())))
+            return list(pool.map(self.decrypt, blocks, chunksize=chunksize))
+        finally:
+            if executor is None:
+                pool.shutdown()
+
+    def encrypt_text(self, s):
+        """ Encrypt string s, encoded with encodeText, returns a list of integers """
+        return [self.encrypt(m) for m in encodeText(s, self.bitlen)]
+
+    def decrypt_text(self, c, **kwargs):
+        """ Decrypt the output of encrypt_text (see decrypt_many for kwargs) """
+        return decodeText(self.decrypt_many(c, **kwargs), self.bitlen)
 
     
 def main():
     keylen = 1024
     
-    p = generate_prime_candidate(keylen//2)
-    q = generate_prime_candidate(keylen//2)
-    # this is not a valid RSA modulo, p and q should be tested for primality!
+    p, q = generate_rsa_primes(keylen)
     N = p*q
     try:
         assert N.bit_length() == keylen
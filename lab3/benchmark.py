@@ -0,0 +1,115 @@
+# Latency and throughput of the lab3 primitives.
+#
+# usage: python benchmark.py [--only keygen crt ctr parallel] [--sizes 2048 3072 4096] [--trials 5]
+#                           [--megabytes 256] [--chunk 1048576] [--workers 1 2 4]
+import os
+import time
+import random
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import AISC_03 as lab3
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+def report(name, times):
+    print('%-28s min %10.3f ms  median %10.3f ms  max %10.3f ms' % (
+        name, min(times) * 1e3, statistics.median(times) * 1e3, max(times) * 1e3))
+
+def keygen(args):
+    """Latency of the generation of p and q for keylen-bit moduli, concurrent and serial"""
+    sizes, trials = args.sizes, args.trials
+    with ProcessPoolExecutor(2) as pool:
+        # start the workers before timing
+        lab3.generate_rsa_primes(512, executor=pool)
+        for keylen in sizes:
+            report('keygen %d parallel' % keylen,
+                   [timed(lab3.generate_rsa_primes, keylen, executor=pool) for _ in range(trials)])
+            report('keygen %d serial' % keylen,
+                   [timed(lambda: [lab3.generate_prime(keylen // 2, e=65537) for _ in range(2)]) for _ in range(trials)])
+
+def crt(args, ops=20):
+    """Latency of one private key operation with and without the CRT, and of the decryption
+    of an encodeText message block by block and in a process pool"""
+    sizes, trials = args.sizes, args.trials
+    text = 'The quick brown fox jumps over the lazy dog. ' * 200
+    with ProcessPoolExecutor() as pool:
+        for keylen in sizes:
+            key = lab3.RSAKey.generate(keylen, executor=pool)
+            c = key.encrypt(random.randrange(key.N))
+            withCrt = [timed(key.decrypt, c) for _ in range(trials * ops)]
+            plain = [timed(key.decrypt_plain, c) for _ in range(trials * ops)]
+            report('decrypt %d CRT' % keylen, withCrt)
+            report('decrypt %d plain' % keylen, plain)
+            print('%-28s %.2fx' % ('CRT speedup', statistics.median(plain) / statistics.median(withCrt)))
+            blocks = key.encrypt_text(text)
+            report('decrypt %d x %d serial' % (len(blocks), keylen),
+                   [timed(lambda: [key.decrypt(b) for b in blocks]) for _ in range(trials)])
+            report('decrypt %d x %d pool' % (len(blocks), keylen),
+                   [timed(key.decrypt_many, blocks, executor=pool) for _ in range(trials)])
+
+def ctr(args):
+    """Throughput and peak memory of AES-CTR on a file of args.megabytes MB, streamed in chunks
+    and in memory"""
+    key = os.urandom(16)
+    size = args.megabytes << 20
+    with tempfile.TemporaryDirectory() as tmp:
+        plain, cipher, back = (os.path.join(tmp, name) for name in ('plain', 'cipher', 'back'))
+        with open(plain, 'wb') as f:
+            for _ in range(args.megabytes):
+                f.write(os.urandom(1 << 20))
+        tracemalloc.start()
+        _, speed = lab3.encryptAESCTRFile(key, plain, cipher, args.chunk)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print('%-28s %10.1f MB/s %12d B peak' % ('stream encrypt %d MB' % args.megabytes, speed, peak))
+        speed = lab3.decryptAESCTRFile(key, cipher, back, args.chunk)
+        print('%-28s %10.1f MB/s' % ('stream decrypt %d MB' % args.megabytes, speed))
+        with open(plain, 'rb') as f:
+            data = f.read()
+        with open(back, 'rb') as f:
+            assert f.read() == data
+        tracemalloc.start()
+        seconds = timed(lab3.encryptAESCTR, key, data)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print('%-28s %10.1f MB/s %12d B peak' % ('in memory encrypt %d MB' % args.megabytes, size / seconds / 1e6, peak))
+
+def parallel(args):
+    """Throughput of the multi-threaded AES-CTR on args.megabytes MB for every number of threads,
+    checked byte for byte against the single-threaded encryption"""
+    key, iv = os.urandom(16), os.urandom(16)
+    data = os.urandom(args.megabytes << 20)
+    reference = lab3.encryptAESCTR(key, data, iv)[1]
+    base = args.megabytes / min(timed(lab3.encryptAESCTR, key, data, iv) for _ in range(args.trials))
+    print('%-28s %10.1f MB/s' % ('single-threaded', base))
+    for workers in args.workers:
+        assert lab3.encryptAESCTRParallel(key, data, iv, workers)[1] == reference
+        speed = args.megabytes / min(timed(lab3.encryptAESCTRParallel, key, data, iv, workers) for _ in range(args.trials))
+        print('%-28s %10.1f MB/s %6.2fx' % ('%d threads' % workers, speed, speed / base))
+
+BENCHMARKS = {'keygen': keygen, 'crt': crt, 'ctr': ctr, 'parallel': parallel}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the lab3 primitives')
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='benchmarks to run')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2048, 3072, 4096], help='RSA modulus sizes in bits')
+    parser.add_argument('--trials', type=int, default=5)
+    parser.add_argument('--megabytes', type=int, default=256, help='size of the AES-CTR test file')
+    parser.add_argument('--chunk', type=int, default=1 << 20, help='AES-CTR streaming chunk size in bytes')
+    parser.add_argument('--workers', type=int, nargs='+', help='thread counts of the parallel AES-CTR')
+    args = parser.parse_args()
+    if not args.workers:
+        cores = os.cpu_count()
+        args.workers = sorted({1 << i for i in range(cores.bit_length())} | {cores})
+    for name in args.only or BENCHMARKS:
+        BENCHMARKS[name](args)
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,11 @@
 import hashlib
 import os
+import sys
 import secrets
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from numbertheory import cached_modinv
+
 aU = int.from_bytes(b"it is the constant a", byteorder='little')
 bU = int.from_bytes(b"it is the constant b", byteorder='big')
 
@@ -11,22 +15,6 @@ qDSA = 0x996F967F6C8E388D9E28D01E205FBA957A5698B1
 gDSA = 0x07B0F92546150B62514BB771E2A0C0CE387F03BDA6C56B505209FF25FD3C133D89BBCD97E904E09114D9A7DEFDEADFC9078EA544D2E401AEECC40BB9FBBF78FD87995A10A1C27CB7789B594BA7EFB5C4326A9FE59A070E136DB77175464ADCA417BE5DCE2F40D10A46A3A3943F26AB7FD9C0398FF8C76EE0A56826A8A88F1DBD
 m2=''
 
-def egcd(a, b):
-    """computes g, x, y such that g = GCD(a, b) and x*a + y*b = g"""
-    if a == 0:
-        return (b, 0, 1)
-    else:
-        g, x, y = egcd(b % a, a)
-        return (g, y - (b // a) * x, x)
-
-def modinv(a, m):
-    """computes a^(-1) mod m"""
-    g, x, y = egcd(a % m, m)
-    if g != 1:
-        raise Exception('modular inverse does not exist')
-    else:
-        return x % m
-
 def main():
     
     message = b"SHA-256 is a cryptographic hash function"
@@ -59,9 +47,12 @@ def main():
     q=qDSA
     private=0
     
+    # the inverses do not depend on i
+    r2inv=cached_modinv(r2,q)
+    kinv=cached_modinv(1-r1*r2inv,q)
     for i in range(1,101):
-        k=(s1+r1*(i*modinv(r2,q)-s2*modinv(r2,q)+q))%q*modinv(1-r1*modinv(r2,q),q)+q
-        x=(k+i-s2)*modinv(r2,q)+1*q
+        k=(s1+r1*(i*r2inv-s2*r2inv+q))%q*kinv+q
+        x=(k+i-s2)*r2inv+1*q
         (r_1,s_1)=SchnorrSign(x,message1)
         #print('k=',k,'\nx=',x,'\nr=',r,'\ns=',s)
         if signatureVerification(r_1,s_1,y_prof,message1)==True:
@@ -183,7 +174,7 @@ def Preimage(hash1,size):
     m2=-1
     n=10
     while m2<0:
-        m2=(h-b)*modinv(a,q)+n*q
+        m2=(h-b)*cached_modinv(a,q)+n*q
         n=n*10
     print("m2: "+str(m2))
     